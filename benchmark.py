@@ -0,0 +1,255 @@
+"""Latency and throughput benchmark of discovery, control and measurement
+
+Runs against the simulated backend, so no instrument is needed:
+
+    python benchmark.py --devices 8 --latency-ms 5 --output results.json
+
+Every scenario reports p50/p95/p99 latencies and operations per second.
+Measurement scenarios also report samples per second. --output saves the
+results as JSON so releases can be compared.
+"""
+import argparse
+import json
+import platform
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from power_supply import PowerSupply
+from controller import AlimentationController
+from simulator import MODELS, SimulatedResourceManager
+
+def percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    index = min(int(fraction * len(ordered) + 0.5), len(ordered)) - 1
+    return ordered[max(index, 0)]
+
+class Scenario:
+    """Latencies, errors and sample count collected by one benchmark scenario"""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.samples = 0
+        self.elapsed = 0.0
+        self.lock = threading.Lock()
+
+    def timed(self, operation, samples=0):
+        """Run operation, recording its latency or counting it as an error"""
+        started = time.perf_counter()
+        try:
+            operation()
+        except Exception:
+            with self.lock:
+                self.errors += 1
+            return
+        latency = time.perf_counter() - started
+        with self.lock:
+            self.latencies.append(latency)
+            self.samples += samples
+
+    def summary(self):
+        ordered = sorted(self.latencies)
+        milliseconds = lambda value: round(value * 1000, 3) if value is not None else None
+        result = {
+            'operations': len(ordered),
+            'errors': self.errors,
+            'elapsed_s': round(self.elapsed, 3),
+            'mean_ms': milliseconds(sum(ordered) / len(ordered)) if ordered else None,
+            'p50_ms': milliseconds(percentile(ordered, 0.50)),
+            'p95_ms': milliseconds(percentile(ordered, 0.95)),
+            'p99_ms': milliseconds(percentile(ordered, 0.99)),
+            'max_ms': milliseconds(ordered[-1]) if ordered else None,
+            'operations_per_s': round(len(ordered) / self.elapsed, 1) if self.elapsed else None,
+        }
+        if self.samples:
+            result['samples_per_s'] = round(self.samples / self.elapsed, 1) if self.elapsed else None
+        return result
+
+def reset_sessions():
+    """Start every scenario with an empty session pool and no remembered batch support"""
+    PowerSupply.close_all()
+    PowerSupply._batch_support.clear()
+
+def run_scenario(name, body):
+    scenario = Scenario(name)
+    reset_sessions()
+    started = time.perf_counter()
+    body(scenario)
+    scenario.elapsed = time.perf_counter() - started
+    return scenario
+
+def discover_channels():
+    """(device, channel) pairs of every simulated output"""
+    channels = []
+    for device, info in PowerSupply.list_available_devices(use_cache=False):
+        if info != "Unable to identify":
+            channels.extend((device, channel) for channel in AlimentationController.channels_of(info))
+    return channels
+
+def bench_discovery(args, channels):
+    def body(scenario):
+        for _ in range(args.scans):
+            scenario.timed(lambda: PowerSupply.list_available_devices(use_cache=False))
+    return run_scenario('discovery', body)
+
+def bench_connect(args, channels):
+    controller = AlimentationController()
+
+    # A connect opens the pooled session and takes the remote lock, as in the GUI
+    def body(scenario):
+        for _ in range(args.iterations):
+            for device, channel in channels:
+                scenario.timed(lambda: controller.connect(device, channel))
+                controller.disconnect(device, channel)
+            PowerSupply.close_all()
+    return run_scenario('connect', body)
+
+def bench_disconnect(args, channels):
+    controller = AlimentationController()
+
+    def body(scenario):
+        for _ in range(args.iterations):
+            for device, channel in channels:
+                controller.connect(device, channel)
+                scenario.timed(lambda: controller.disconnect(device, channel))
+    return run_scenario('disconnect', body)
+
+def bench_setpoints(args, channels):
+    controller = AlimentationController()
+
+    # Same order as the CLI: protections first, then the voltage
+    def apply(device, channel):
+        controller.set_overvoltage(device, 13, channel)
+        controller.set_overcurrent(device, 2, channel)
+        controller.set_voltage(device, 12, channel)
+
+    def body(scenario):
+        for device, channel in channels:
+            controller.connect(device, channel)
+        for _ in range(args.iterations):
+            for device, channel in channels:
+                # Forget the values just written, or the state cache would skip the writes
+                controller.state.invalidate(device, channel, 'voltage', 'overvoltage', 'overcurrent')
+                scenario.timed(lambda: apply(device, channel))
+        for device, channel in channels:
+            controller.disconnect(device, channel)
+    return run_scenario('setpoints', body)
+
+def bench_measure(args, channels):
+    controller = AlimentationController()
+
+    # One channel at a time, like the Measure button
+    def body(scenario):
+        for _ in range(args.iterations):
+            for device, channel in channels:
+                scenario.timed(lambda: controller.measure(device, channel), samples=1)
+    return run_scenario('measure', body)
+
+def bench_acquisition(args, channels):
+    # One poller per device reading all its channels at once, like the measurement engine
+    devices = {}
+    for device, channel in channels:
+        devices.setdefault(device, []).append(channel)
+
+    def poll(scenario, device, device_channels, deadline):
+        while time.perf_counter() < deadline:
+            with PowerSupply.session(device) as power_supply:
+                scenario.timed(lambda: power_supply.measure_channels(device_channels),
+                               samples=len(device_channels))
+
+    def body(scenario):
+        deadline = time.perf_counter() + args.duration
+        with ThreadPoolExecutor(max_workers=len(devices) or 1) as executor:
+            for device, device_channels in devices.items():
+                executor.submit(poll, scenario, device, device_channels, deadline)
+    return run_scenario('acquisition', body)
+
+SCENARIOS = {
+    'discovery': bench_discovery,
+    'connect': bench_connect,
+    'disconnect': bench_disconnect,
+    'setpoints': bench_setpoints,
+    'measure': bench_measure,
+    'acquisition': bench_acquisition,
+}
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Benchmark discovery, control and measurement against "
+                                                 "simulated power supplies")
+    parser.add_argument('--devices', type=int, default=4, help="number of simulated devices")
+    parser.add_argument('--models', default=', '.join(MODELS),
+                        help="comma separated models, repeated to reach --devices")
+    parser.add_argument('--latency-ms', type=float, default=5.0, help="latency of every command")
+    parser.add_argument('--jitter-ms', type=float, default=1.0, help="random +/- latency jitter")
+    parser.add_argument('--failure-rate', type=float, default=0.0,
+                        help="probability that a command times out")
+    parser.add_argument('--iterations', type=int, default=20,
+                        help="rounds over all channels for the connect, setpoint and measure scenarios")
+    parser.add_argument('--scans', type=int, default=10, help="number of discovery scans")
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help="length of the continuous acquisition scenario, in seconds")
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help="scenario to run, can be repeated (default: all)")
+    parser.add_argument('--output', help="write the results to this JSON file")
+    return parser
+
+def print_results(results):
+    columns = ('operations', 'errors', 'p50_ms', 'p95_ms', 'p99_ms', 'operations_per_s', 'samples_per_s')
+    print('scenario'.ljust(12) + ''.join(column.rjust(18) for column in columns))
+    for name, result in results.items():
+        cells = ('' if result.get(column) is None else str(result[column]) for column in columns)
+        print(name.ljust(12) + ''.join(cell.rjust(18) for cell in cells))
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    models = [model.strip() for model in args.models.split(',') if model.strip()]
+    if args.devices < 1 or not models:
+        print("At least one device and one model are needed", file=sys.stderr)
+        return 2
+
+    # The simulator takes the place of the VISA library for the whole run
+    PowerSupply._rm = SimulatedResourceManager(
+        [models[index % len(models)] for index in range(args.devices)],
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        failure_rate=args.failure_rate
+    )
+    channels = discover_channels()
+
+    results = {}
+    try:
+        for name in args.scenario or SCENARIOS:
+            results[name] = SCENARIOS[name](args, channels).summary()
+    finally:
+        PowerSupply.close_all()
+
+    print_results(results)
+    if args.output:
+        report = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'settings': {
+                'devices': args.devices,
+                'channels': len(channels),
+                'models': models,
+                'latency_ms': args.latency_ms,
+                'jitter_ms': args.jitter_ms,
+                'failure_rate': args.failure_rate,
+                'iterations': args.iterations,
+                'scans': args.scans,
+                'duration_s': args.duration,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+import argparse
+import json
+import sys
+import time
+
+from power_supply import DeviceNameResolver, PowerSupply
+from controller import AlimentationController
+
+def parse_channel(value):
+    """Accept '1', '2', ... and treat '0' or '-' as a single channel device"""
+    return None if value in ('0', '-') else value
+
+def add_target_arguments(parser):
+    parser.add_argument('resource', help="VISA resource name, as printed by 'list'")
+    parser.add_argument('-c', '--channel', type=parse_channel, default=None,
+                        help="output channel of multi channel devices")
+
+def command_list(controller, args):
+    names = DeviceNameResolver()
+    entries = []
+    for device, info, channel in controller.iter_channels(use_cache=not args.no_cache):
+        entries.append({'resource': device, 'channel': channel, 'name': names.resolve(info), 'idn': info})
+        if not args.json:
+            print(f"{device}\t{channel or '-'}\t{names.resolve(info)}\t({info})", flush=True)
+
+    if args.json:
+        print(json.dumps(entries, indent=2))
+    elif not entries:
+        print("No identifiable devices found", file=sys.stderr)
+    return 0
+
+def command_set(controller, args):
+    if args.voltage is None and args.ovp is None and args.ocp is None:
+        print("Nothing to set: give --voltage, --ovp and/or --ocp", file=sys.stderr)
+        return 2
+
+    controller.connect(args.resource, args.channel)
+    try:
+        # Protection limits go first so the new voltage is already covered by them
+        if args.ovp is not None:
+            controller.set_overvoltage(args.resource, args.ovp, args.channel)
+        if args.ocp is not None:
+            controller.set_overcurrent(args.resource, args.ocp, args.channel)
+        if args.voltage is not None:
+            controller.set_voltage(args.resource, args.voltage, args.channel)
+    finally:
+        if not args.keep_lock:
+            controller.disconnect(args.resource, args.channel)
+    return 0
+
+def command_output(controller, args):
+    controller.connect(args.resource, args.channel)
+    try:
+        controller.set_output(args.resource, args.command == 'on', args.channel)
+    finally:
+        if not args.keep_lock:
+            controller.disconnect(args.resource, args.channel)
+    return 0
+
+def command_group(controller, args):
+    targets = controller.channel_groups().get(args.name)
+    if not targets:
+        print(f"Unknown or empty group '{args.name}' (see the [groups] section)", file=sys.stderr)
+        return 2
+    if args.action == 'set' and args.voltage is None and args.ovp is None and args.ocp is None:
+        print("Nothing to set: give --voltage, --ovp and/or --ocp", file=sys.stderr)
+        return 2
+
+    connected = []
+    try:
+        for device, channel in targets:
+            controller.connect(device, channel)
+            connected.append((device, channel))
+
+        if args.action == 'set':
+            result = controller.apply_group_setpoints(targets, voltage=args.voltage,
+                                                      overvoltage=args.ovp, overcurrent=args.ocp)
+        else:
+            result = controller.set_group_output(targets, args.action == 'on')
+    finally:
+        if not args.keep_lock:
+            for device, channel in connected:
+                controller.disconnect(device, channel)
+
+    for device, error in result.errors.items():
+        print(f"Error on {device}: {error}", file=sys.stderr)
+    skew = f", skew {result.skew * 1000:.1f} ms" if result.skew is not None else ""
+    print(f"{len(result.completed)} channel(s) done{skew}")
+    return 1 if result.errors else 0
+
+def command_sequence(controller, args):
+    from sequence import Profile, SequenceRunner
+    if args.ramp:
+        profile = Profile.ramp(*args.ramp, interval=args.interval)
+    elif args.staircase:
+        profile = Profile.staircase(*args.staircase)
+    else:
+        profile = Profile.from_csv(args.table)
+
+    controller.connect(args.resource, args.channel)
+    try:
+        runner = SequenceRunner(args.resource, args.channel, profile, args.mode, state=controller.state)
+        runner.start()
+        try:
+            while runner.is_alive():
+                runner.join(0.2)
+        except KeyboardInterrupt:
+            runner.stop()
+            runner.join()
+    finally:
+        if not args.keep_lock:
+            controller.disconnect(args.resource, args.channel)
+
+    # Step events are only useful to the GUI; keep the final outcome
+    while True:
+        kind, device, channel, *payload = runner.events.get()
+        if kind == 'error':
+            print(f"Error: {payload[0]}", file=sys.stderr)
+            return 1
+        if kind == 'done':
+            print(json.dumps(payload[0]))
+            return 0
+
+def command_state(controller, args):
+    # Without -c every channel of the device is read back with one batched query
+    channels = [args.channel] if args.channel is not None else None
+    states = controller.resync(args.resource, channels)
+    if args.json:
+        print(json.dumps([dict(state, resource=args.resource, channel=channel)
+                          for channel, state in states.items()], indent=2))
+        return 0
+    for channel, state in states.items():
+        print(f"{channel or '-'}\tVOLT {state['voltage']}\tVOLT:PROT {state['overvoltage']}\t"
+              f"CURR:PROT {state['overcurrent']}\tOUTP {'ON' if state['output'] else 'OFF'}")
+    return 0
+
+def print_sample(args, timestamp, values):
+    voltage, current, power = values
+    if args.json:
+        print(json.dumps({'resource': args.resource, 'channel': args.channel, 'timestamp': timestamp,
+                          'voltage': voltage, 'current': current, 'power': power}), flush=True)
+    else:
+        print(f"{timestamp:.3f}\t{voltage}\t{current}\t{power}", flush=True)
+
+def command_measure(controller, args):
+    if args.rate is not None and not 0 < args.rate < float('inf'):
+        print("--rate must be a positive number of Hz", file=sys.stderr)
+        return 2
+    if args.rate is None:
+        print_sample(args, time.time(), controller.measure(args.resource, args.channel))
+        return 0
+
+    # Continuous acquisition runs on the measurement engine until --count or Ctrl+C
+    from measurement import MeasurementEngine
+    engine = MeasurementEngine()
+    engine.start_channel(args.resource, args.channel, args.rate)
+    received = 0
+    try:
+        while not args.count or received < args.count:
+            kind, device, channel, *payload = engine.results.get()
+            if kind == 'sample':
+                print_sample(args, *payload)
+                received += 1
+            elif kind == 'missed':
+                print(f"Missed {payload[0]} measurement deadlines", file=sys.stderr)
+            else:
+                print(f"Error measuring values: {payload[0]}", file=sys.stderr)
+                return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+    return 0
+
+def command_serve(controller, args):
+    from control_server import ControlServer
+    from power_supply import load_config
+    config = load_config()
+    server = ControlServer(controller,
+                           host=args.host or config.get('server', 'host', fallback='127.0.0.1').strip() or '127.0.0.1',
+                           port=args.port if args.port is not None else config.getint('server', 'port', fallback=7025),
+                           max_rate=config.getfloat('measurement', 'max_rate_hz', fallback=20.0),
+                           log=lambda message: print(message, file=sys.stderr, flush=True))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="alimentation",
+                                     description="Control the power supplies without the GUI")
+    parser.add_argument('--command-stats', metavar='PATH',
+                        help="time every SCPI command and save the statistics to this JSON file")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    list_parser = commands.add_parser('list', help="identify the connected devices")
+    list_parser.add_argument('--json', action='store_true', help="print the devices as JSON")
+    list_parser.add_argument('--no-cache', action='store_true', help="ignore the discovery cache")
+    list_parser.set_defaults(handler=command_list)
+
+    set_parser = commands.add_parser('set', help="set the voltage and protection limits of a channel")
+    add_target_arguments(set_parser)
+    set_parser.add_argument('--voltage', type=float, help="output voltage in V")
+    set_parser.add_argument('--ovp', type=float, help="over voltage protection limit in V")
+    set_parser.add_argument('--ocp', type=float, help="over current protection limit in A")
+    set_parser.add_argument('--keep-lock', action='store_true',
+                            help="leave the device in remote mode afterwards")
+    set_parser.set_defaults(handler=command_set)
+
+    for name, description in (('on', "turn an output on"), ('off', "turn an output off")):
+        output_parser = commands.add_parser(name, help=description)
+        add_target_arguments(output_parser)
+        output_parser.add_argument('--keep-lock', action='store_true',
+                                   help="leave the device in remote mode afterwards")
+        output_parser.set_defaults(handler=command_output)
+
+    group_parser = commands.add_parser('group', help="act on all channels of a [groups] entry at once")
+    group_parser.add_argument('action', choices=('on', 'off', 'set'))
+    group_parser.add_argument('name', help="group name from the [groups] section")
+    group_parser.add_argument('--voltage', type=float, help="output voltage in V (with 'set')")
+    group_parser.add_argument('--ovp', type=float, help="over voltage protection limit in V (with 'set')")
+    group_parser.add_argument('--ocp', type=float, help="over current protection limit in A (with 'set')")
+    group_parser.add_argument('--keep-lock', action='store_true',
+                              help="leave the devices in remote mode afterwards")
+    group_parser.set_defaults(handler=command_group)
+
+    sequence_parser = commands.add_parser('sequence', help="play a voltage ramp, staircase or CSV table")
+    add_target_arguments(sequence_parser)
+    profile = sequence_parser.add_mutually_exclusive_group(required=True)
+    profile.add_argument('--ramp', type=float, nargs=3, metavar=('START', 'STOP', 'DURATION'),
+                         help="linear ramp in V over DURATION seconds")
+    profile.add_argument('--staircase', type=float, nargs=4, metavar=('START', 'STOP', 'STEP', 'DWELL'),
+                         help="levels from START to STOP V by STEP, held DWELL seconds each")
+    profile.add_argument('--table', metavar='CSV', help="'voltage,dwell_s' rows")
+    sequence_parser.add_argument('--interval', type=float, default=0.1, help="ramp step time in s (default 0.1)")
+    sequence_parser.add_argument('--mode', choices=('auto', 'host', 'list'), default='auto',
+                                 help="upload to the instrument list memory (list), write each step from "
+                                      "here (host), or list when supported (auto)")
+    sequence_parser.add_argument('--keep-lock', action='store_true',
+                                 help="leave the device in remote mode afterwards")
+    sequence_parser.set_defaults(handler=command_sequence)
+
+    state_parser = commands.add_parser('state', help="read back the setpoints and output state")
+    state_parser.add_argument('resource', help="VISA resource name, as printed by 'list'")
+    state_parser.add_argument('-c', '--channel', type=parse_channel, default=None,
+                              help="only this channel (default: all channels of the device)")
+    state_parser.add_argument('--json', action='store_true', help="print the channels as JSON")
+    state_parser.set_defaults(handler=command_state)
+
+    measure_parser = commands.add_parser('measure', help="read voltage, current and power")
+    add_target_arguments(measure_parser)
+    measure_parser.add_argument('--rate', type=float, help="keep measuring at this rate, in Hz")
+    measure_parser.add_argument('--count', type=int, default=0,
+                                help="number of samples to take with --rate (default: until Ctrl+C)")
+    measure_parser.add_argument('--json', action='store_true', help="print one JSON object per sample")
+    measure_parser.set_defaults(handler=command_measure)
+
+    serve_parser = commands.add_parser('serve', help="run the JSON-RPC control server for automation clients")
+    serve_parser.add_argument('--host', help="address to listen on (default: [server] host, 127.0.0.1)")
+    serve_parser.add_argument('--port', type=int, help="TCP port to listen on (default: [server] port, 7025)")
+    serve_parser.set_defaults(handler=command_serve)
+
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    controller = AlimentationController()
+    if args.command_stats:
+        PowerSupply.enable_command_stats()
+    try:
+        return args.handler(controller, args)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 1
+    finally:
+        controller.close()
+        if args.command_stats:
+            PowerSupply.command_stats.export_json(args.command_stats)
+
+if __name__ == "__main__":
+    sys.exit(main())
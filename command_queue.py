@@ -0,0 +1,71 @@
+import threading
+from collections import deque
+from concurrent.futures import Future
+
+class DeviceCommandQueue(threading.Thread):
+    """Ordered queue of operations on one device, run by its own worker thread
+
+    submit() returns a Future. Operations given a coalescing key replace the
+    waiting operation with the same key: only the latest one runs, at the
+    position of the latest submission, and every merged future gets its outcome.
+    """
+
+    def __init__(self, device):
+        super().__init__(name=f"commands {device}", daemon=True)
+        self.device = device
+        self.pending = deque()  # [operation, key, futures] in submission order
+        self.waiting = {}  # key -> entry of pending, for coalescing
+        self.condition = threading.Condition()
+        self.stopping = False
+        self.coalesced = 0
+
+    def submit(self, operation, key=None):
+        future = Future()
+        with self.condition:
+            if self.stopping:
+                raise RuntimeError(f"Command queue of {self.device} is closed")
+
+            futures = [future]
+            previous = self.waiting.pop(key, None) if key is not None else None
+            if previous is not None:
+                # The stale write is dropped, its callers get the outcome of the new one
+                self.pending.remove(previous)
+                futures = previous[2] + futures
+                self.coalesced += 1
+
+            entry = [operation, key, futures]
+            self.pending.append(entry)
+            if key is not None:
+                self.waiting[key] = entry
+            self.condition.notify()
+        return future
+
+    def stop(self):
+        """Finish the queued operations, then let the worker exit"""
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopping:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                operation, key, futures = self.pending.popleft()
+                if key is not None:
+                    del self.waiting[key]
+
+            # Futures cancelled by their callers are skipped, unless a merged one still wants the result
+            futures = [future for future in futures if future.set_running_or_notify_cancel()]
+            if not futures:
+                continue
+            try:
+                result = operation()
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+            else:
+                for future in futures:
+                    future.set_result(result)
@@ -0,0 +1,530 @@
+"""Local control server for automation clients
+
+Clients connect over TCP and send one JSON-RPC 2.0 request per line. Each
+answer is one line too. Every client shares the controller of the tool. As a
+result, a test executive reuses the sessions, locks and command queues of the
+GUI and never opens a competing VISA session. Instrument operations are
+queued on the command queue of their device, so requests from several clients
+run one after another on the single pooled session of each instrument.
+
+Measurements are streamed through subscriptions. Each subscribed channel is
+sampled once, at the highest rate its subscribers asked for. Every client gets
+'measurement' notifications at its own rate:
+
+    {"jsonrpc": "2.0", "method": "measurement", "params": {"subscription": 1,
+     "resource": "...", "channel": "1", "timestamp": 1700000000.0,
+     "voltage": 12.0, "current": 1.2, "power": 14.4}}
+
+'measurement_missed' and 'measurement_error' report late or failed samples;
+an error ends the subscription. A client that stops reading has its
+notifications dropped without slowing down the others.
+"""
+
+import inspect
+import itertools
+import json
+import math
+import queue
+import socketserver
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from controller import AlimentationController
+from measurement import MeasurementEngine, parse_reading
+from power_supply import DeviceNameResolver, PowerSupply, load_config
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+DEVICE_ERROR = -32000
+ACCESS_DENIED = -32001
+
+class RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+def parse_channel(channel):
+    """Accept 1, "1", ... and treat null, 0 or "-" as a single channel device"""
+    if channel is None or str(channel) in ('0', '-'):
+        return None
+    return str(channel)
+
+def reading_values(values):
+    """{'voltage', 'current', 'power'} as numbers, None for a reading without one"""
+    numbers = {}
+    for name, reading in zip(('voltage', 'current', 'power'), values):
+        number = parse_reading(reading)
+        numbers[name] = None if math.isnan(number) else number
+    return numbers
+
+class Subscription:
+    __slots__ = ('id', 'client', 'device', 'channel', 'period', 'last_sent')
+
+    def __init__(self, id, client, device, channel, rate_hz):
+        self.id = id
+        self.client = client
+        self.device = device
+        self.channel = channel
+        self.period = 1.0 / rate_hz
+        self.last_sent = -math.inf
+
+class ClientConnection(socketserver.StreamRequestHandler):
+    """One automation client: requests are read and answered in order on its own thread
+
+    Answers and notifications go through a bounded outbox written by a second
+    thread, so a client that stops reading never holds up the measurements of
+    the others. Notifications that do not fit in its outbox are dropped and
+    counted.
+    """
+
+    OUTBOX_SIZE = 1000
+
+    def setup(self):
+        super().setup()
+        self.outbox = queue.Queue(self.OUTBOX_SIZE)
+        self.dropped = 0
+        self.closed = False
+        self.writer = threading.Thread(target=self.write_messages, name=f"control client {self.client_address}",
+                                       daemon=True)
+        self.writer.start()
+
+    def handle(self):
+        control = self.server.control
+        control.register(self)
+        try:
+            for line in self.rfile:
+                if not line.strip():
+                    continue
+                response = control.handle_line(self, line)
+                if response is not None:
+                    self.send(response)
+        except OSError:
+            pass
+        finally:
+            control.unregister(self)
+
+    def finish(self):
+        self.closed = True
+        try:
+            # Let the writer flush the answers still queued
+            self.outbox.put(None, timeout=1.0)
+        except queue.Full:
+            pass
+        self.writer.join(timeout=1.0)
+        try:
+            super().finish()
+        except OSError:
+            pass
+
+    def send(self, message):
+        """Queue an answer, waiting for room in the outbox"""
+        while not self.closed:
+            try:
+                self.outbox.put(message, timeout=1.0)
+                return
+            except queue.Full:
+                pass
+
+    def notify(self, method, params):
+        """Queue a notification, dropped when the client is falling behind"""
+        if self.closed:
+            return
+        try:
+            self.outbox.put_nowait({'jsonrpc': '2.0', 'method': method, 'params': params})
+        except queue.Full:
+            self.dropped += 1
+
+    def write_messages(self):
+        while True:
+            message = self.outbox.get()
+            if message is None:
+                return
+            try:
+                self.wfile.write(json.dumps(message).encode() + b'\n')
+                self.wfile.flush()
+            except (OSError, ValueError):
+                # The client has gone, the reader thread cleans up
+                self.closed = True
+                return
+
+class ControlServer:
+    """JSON-RPC 2.0 server exposing a controller to local automation clients
+
+    The methods are the rpc_* methods below, called with named or positional
+    params. Channels are given as in the command line: "1", "2", ... or null
+    on single channel devices. Operations that fail on the instrument return a
+    DEVICE_ERROR with the message of the failure.
+
+    A client changes a channel only after connecting it, and the channel then
+    belongs to that client until it disconnects it or the client goes away.
+    Channels connected from the window, or by another client, can be read and
+    measured but not changed (ACCESS_DENIED). As in the window, a voltage is
+    refused until the OVP and OCP of the channel have been set since it was
+    connected.
+    """
+
+    REQUEST_TIMEOUT = 30.0  # Seconds a request waits for its turn on the device and its outcome
+
+    def __init__(self, controller=None, host='127.0.0.1', port=7025, max_rate=20.0, log=None):
+        self.controller = controller or AlimentationController()
+        self.max_rate = max_rate
+        self.log = log or (lambda message: None)
+        self.names = DeviceNameResolver()
+
+        self.engine = MeasurementEngine()
+        self.subscriptions = {}  # id -> Subscription
+        self.subscription_ids = itertools.count(1)
+        self.owners = {}  # (device, channel) -> ClientConnection that connected the channel
+        self.protections = {}  # (device, channel) -> protections set since the channel was connected
+        self.clients = set()
+        self.lock = threading.Lock()
+        self.engine_lock = threading.Lock()
+
+        self.server = socketserver.ThreadingTCPServer((host, port), ClientConnection, bind_and_activate=False)
+        self.server.daemon_threads = True
+        self.server.allow_reuse_address = True
+        self.server.control = self
+        self.server.server_bind()
+        self.server.server_activate()
+        self.address = self.server.server_address
+
+        self.threads = []
+
+    @classmethod
+    def from_config(cls, controller=None, log=None):
+        """Server configured by the [server] section, or None when it is not enabled"""
+        config = load_config()
+        if not config.getboolean('server', 'enabled', fallback=False):
+            return None
+        return cls(controller,
+                   host=config.get('server', 'host', fallback='127.0.0.1').strip() or '127.0.0.1',
+                   port=config.getint('server', 'port', fallback=7025),
+                   max_rate=config.getfloat('measurement', 'max_rate_hz', fallback=20.0),
+                   log=log)
+
+    def start(self):
+        """Accept clients and stream measurements from background threads"""
+        self.threads = [threading.Thread(target=self.server.serve_forever, name="control server", daemon=True),
+                        threading.Thread(target=self.dispatch_measurements, name="control server measurements",
+                                         daemon=True)]
+        for thread in self.threads:
+            thread.start()
+        self.log(f"Control server listening on {self.address[0]}:{self.address[1]}")
+
+    def serve_forever(self):
+        """Run until stop() is called from another thread or Ctrl+C"""
+        self.start()
+        try:
+            while any(thread.is_alive() for thread in self.threads):
+                time.sleep(0.5)
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stop accepting clients, close the open connections and end every subscription"""
+        if self.threads:
+            self.server.shutdown()
+        self.server.server_close()
+        with self.lock:
+            clients = list(self.clients)
+            self.subscriptions.clear()
+        for client in clients:
+            try:
+                client.connection.shutdown(2)
+            except OSError:
+                pass
+        self.engine.stop()
+        self.engine.results.put(None)
+
+    def register(self, client):
+        with self.lock:
+            self.clients.add(client)
+        self.log(f"Control client connected from {client.client_address[0]}:{client.client_address[1]}")
+
+    def unregister(self, client):
+        with self.lock:
+            self.clients.discard(client)
+            ended = [subscription for subscription in self.subscriptions.values() if subscription.client is client]
+            released = [key for key, owner in self.owners.items() if owner is client]
+        for subscription in ended:
+            self.end_subscription(subscription.id)
+
+        # Give the channels of a client that went away back to the front panel
+        for device, channel in released:
+            self.controller.submit(device, lambda device=device, channel=channel:
+                                   self.release_channel(device, channel))
+        message = f"Control client {client.client_address[0]}:{client.client_address[1]} disconnected"
+        if client.dropped:
+            message += f", {client.dropped} notifications dropped"
+        self.log(message)
+
+    def handle_line(self, client, line):
+        """Answer one request line, None for a notification"""
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return self.error_response(None, PARSE_ERROR, f"Parse error: {str(e)}")
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return self.error_response(None, INVALID_REQUEST, "Invalid request")
+
+        request_id = request.get('id')
+        try:
+            result = self.call(client, request['method'], request.get('params', {}))
+        except RpcError as e:
+            response = self.error_response(request_id, e.code, str(e))
+        except ValueError as e:
+            response = self.error_response(request_id, INVALID_PARAMS, str(e))
+        except FutureTimeoutError:
+            response = self.error_response(request_id, DEVICE_ERROR, "Timed out waiting for the device")
+        except Exception as e:
+            response = self.error_response(request_id, DEVICE_ERROR, str(e))
+        else:
+            response = {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+        return response if 'id' in request else None
+
+    @staticmethod
+    def error_response(request_id, code, message):
+        return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+    def call(self, client, method, params):
+        handler = getattr(self, f"rpc_{method}", None)
+        if handler is None:
+            raise RpcError(METHOD_NOT_FOUND, f"Method not found: {method}")
+        if isinstance(params, dict):
+            args, kwargs = [], params
+        elif isinstance(params, list):
+            args, kwargs = params, {}
+        else:
+            raise RpcError(INVALID_PARAMS, "params must be an object or an array")
+        try:
+            inspect.signature(handler).bind(client, *args, **kwargs)
+        except TypeError as e:
+            raise RpcError(INVALID_PARAMS, f"Invalid params for {method}: {str(e)}")
+        return handler(client, *args, **kwargs)
+
+    def run(self, device, operation, key=None):
+        """Run an operation on the command queue of a device and wait for its outcome"""
+        return self.controller.submit(device, operation, key).result(self.REQUEST_TIMEOUT)
+
+    # Methods callable by the clients
+
+    def rpc_list_devices(self, client, use_cache=True):
+        """Identify the connected devices: [{'resource', 'channel', 'name', 'idn'}]
+
+        Resources with a pooled session, such as those held by the window, are
+        asked through their command queue on that session. Only the other
+        resources are probed with a session of their own.
+        """
+        resources = PowerSupply.list_resources()
+        pooled = PowerSupply.pooled_resources()
+        futures = {device: self.controller.submit(device, lambda device=device: self.controller.identify(device))
+                   for device in resources if device in pooled}
+
+        identified = {}
+        for device, future in futures.items():
+            try:
+                identified[device] = future.result(self.REQUEST_TIMEOUT)
+            except Exception:
+                # A device that stopped answering is not listed, as with a failed probe
+                pass
+        unpooled = [device for device in resources if device not in pooled]
+        for device, info in PowerSupply.iter_available_devices(unpooled, use_cache=use_cache):
+            if info != "Unable to identify":
+                identified[device] = info
+
+        entries = []
+        for device in resources:
+            info = identified.get(device)
+            if info is None:
+                continue
+            for channel in self.controller.channels_of(info):
+                entries.append({'resource': device, 'channel': channel, 'name': self.names.resolve(info),
+                                'idn': info})
+        return entries
+
+    def owns(self, device, channel):
+        """Whether a client has connected a channel, which the window must then leave alone"""
+        with self.lock:
+            return (device, channel) in self.owners
+
+    def check_owner(self, client, device, channel):
+        with self.lock:
+            owner = self.owners.get((device, channel))
+        if owner is client:
+            return
+        if owner is not None:
+            raise RpcError(ACCESS_DENIED, "The channel is connected by another client")
+        if self.controller.is_connected(device, channel):
+            raise RpcError(ACCESS_DENIED, "The channel is controlled from the window")
+        raise RpcError(ACCESS_DENIED, "Connect the channel first")
+
+    def describe(self, client, device, channel):
+        return f"Control client {client.client_address[1]}: {device}{f' channel {channel}' if channel else ''}"
+
+    def rpc_connect(self, client, resource, channel=None):
+        channel = parse_channel(channel)
+        key = (resource, channel)
+        with self.lock:
+            owner = self.owners.get(key)
+            if owner is not None and owner is not client:
+                raise RpcError(ACCESS_DENIED, "The channel is connected by another client")
+            # Reserved before connecting, so the window cannot take the channel meanwhile
+            self.owners[key] = client
+
+        def connect():
+            # Checked on the command queue, after any connect the window queued earlier
+            if owner is None and self.controller.is_connected(resource, channel):
+                raise RpcError(ACCESS_DENIED, "The channel is controlled from the window")
+            self.controller.connect(resource, channel)
+        try:
+            self.run(resource, connect)
+        except BaseException:
+            if owner is None:
+                with self.lock:
+                    self.owners.pop(key, None)
+            raise
+        with self.lock:
+            self.protections[key] = set()
+        self.log(f"{self.describe(client, resource, channel)} connected")
+        return True
+
+    def rpc_disconnect(self, client, resource, channel=None):
+        channel = parse_channel(channel)
+        self.check_owner(client, resource, channel)
+        self.run(resource, lambda: self.release_channel(resource, channel))
+        self.log(f"{self.describe(client, resource, channel)} disconnected")
+        return True
+
+    def release_channel(self, device, channel):
+        """Unlock a channel connected by a client, on the command queue of its device"""
+        with self.lock:
+            self.owners.pop((device, channel), None)
+            self.protections.pop((device, channel), None)
+        self.controller.disconnect(device, channel)
+
+    def rpc_is_connected(self, client, resource, channel=None):
+        return self.controller.is_connected(resource, parse_channel(channel))
+
+    def rpc_set(self, client, resource, channel=None, voltage=None, overvoltage=None, overcurrent=None):
+        """Write setpoints, the protection limits before the voltage; returns the values written"""
+        channel = parse_channel(channel)
+        key = (resource, channel)
+        self.check_owner(client, resource, channel)
+        setpoints = [(name, value) for name, value in (('overvoltage', overvoltage), ('overcurrent', overcurrent),
+                                                       ('voltage', voltage)) if value is not None]
+        if not setpoints:
+            raise RpcError(INVALID_PARAMS, "Nothing to set: give voltage, overvoltage and/or overcurrent")
+        with self.lock:
+            protections = self.protections.get(key, set()) | {name for name, value in setpoints}
+        if voltage is not None and not {'overvoltage', 'overcurrent'} <= protections:
+            raise RpcError(INVALID_PARAMS, "Set overvoltage and overcurrent before the voltage")
+
+        written = {}
+        for name, value in setpoints:
+            written[name] = self.controller.queue_setpoint(resource, name, float(value), channel).result(
+                self.REQUEST_TIMEOUT)
+            if name != 'voltage':
+                with self.lock:
+                    self.protections.setdefault(key, set()).add(name)
+        return written
+
+    def rpc_output(self, client, resource, on, channel=None):
+        channel = parse_channel(channel)
+        self.check_owner(client, resource, channel)
+        self.run(resource, lambda: self.controller.set_output(resource, bool(on), channel))
+        return bool(on)
+
+    def rpc_output_state(self, client, resource, channel=None, use_cache=True):
+        channel = parse_channel(channel)
+        return self.run(resource, lambda: self.controller.output_state(resource, channel, use_cache))
+
+    def rpc_state(self, client, resource, channel=None):
+        """Read back the settings of a channel, or of every channel of the device: [{'channel', ...}]"""
+        channels = None if channel is None else [parse_channel(channel)]
+        states = self.run(resource, lambda: self.controller.resync(resource, channels))
+        return [dict(state, channel=channel) for channel, state in states.items()]
+
+    def rpc_measure(self, client, resource, channel=None):
+        channel = parse_channel(channel)
+        values = self.run(resource, lambda: self.controller.measure(resource, channel))
+        return dict(reading_values(values), timestamp=time.time())
+
+    def rpc_subscribe(self, client, resource, channel=None, rate=1.0):
+        """Stream the measurements of a channel to this client at rate Hz; returns the subscription id"""
+        channel = parse_channel(channel)
+        rate = float(rate)
+        if not 0 < rate <= self.max_rate:
+            raise RpcError(INVALID_PARAMS, f"rate must be above 0 and at most {self.max_rate:g} Hz")
+        with self.lock:
+            subscription = Subscription(next(self.subscription_ids), client, resource, channel, rate)
+            self.subscriptions[subscription.id] = subscription
+        self.update_channel_rate(resource, channel)
+        return subscription.id
+
+    def rpc_unsubscribe(self, client, subscription):
+        with self.lock:
+            found = self.subscriptions.get(subscription)
+            if found is None or found.client is not client:
+                raise RpcError(INVALID_PARAMS, f"Unknown subscription {subscription}")
+        self.end_subscription(subscription)
+        return True
+
+    # Measurement streams
+
+    def end_subscription(self, subscription_id):
+        with self.lock:
+            subscription = self.subscriptions.pop(subscription_id, None)
+        if subscription is not None:
+            self.update_channel_rate(subscription.device, subscription.channel)
+
+    def update_channel_rate(self, device, channel):
+        """Sample a channel at the highest rate of its subscribers, or stop when it has none"""
+        # Concurrent updates of a channel must reach the engine in the order their rates were computed
+        with self.engine_lock:
+            with self.lock:
+                periods = [subscription.period for subscription in self.subscriptions.values()
+                           if subscription.device == device and subscription.channel == channel]
+            if periods:
+                self.engine.start_channel(device, channel, 1.0 / min(periods))
+            else:
+                self.engine.stop_channel(device, channel)
+
+    def dispatch_measurements(self):
+        """Hand every sample of the engine to the subscribers of its channel"""
+        while True:
+            result = self.engine.results.get()
+            if result is None:
+                return
+            kind, device, channel, *payload = result
+            with self.lock:
+                subscriptions = [subscription for subscription in self.subscriptions.values()
+                                 if subscription.device == device and subscription.channel == channel]
+
+            if kind == 'sample':
+                timestamp, values = payload
+                params = None
+                for subscription in subscriptions:
+                    # Thin the stream down to the rate of each subscriber, with some slack for jitter
+                    if timestamp - subscription.last_sent < subscription.period * 0.9:
+                        continue
+                    subscription.last_sent = timestamp
+                    params = params or dict(reading_values(values), resource=device, channel=channel,
+                                            timestamp=timestamp)
+                    subscription.client.notify('measurement', dict(params, subscription=subscription.id))
+            elif kind == 'missed':
+                for subscription in subscriptions:
+                    subscription.client.notify('measurement_missed', {
+                        'subscription': subscription.id, 'resource': device, 'channel': channel,
+                        'count': payload[0]})
+            else:
+                # Stop polling a channel that does not answer anymore, as the GUI does
+                for subscription in subscriptions:
+                    subscription.client.notify('measurement_error', {
+                        'subscription': subscription.id, 'resource': device, 'channel': channel,
+                        'message': payload[0]})
+                    self.end_subscription(subscription.id)
+                self.log(f"Control server stopped measuring {device} {channel or ''}: {payload[0]}")
@@ -0,0 +1,372 @@
+"""Instrument operations shared by the GUI, the command line and the control server
+
+Every operation runs on the command queue of its device, so a device sees one
+command at a time. The controller keeps a StateCache of the channel settings:
+a setpoint the channel already has is not sent again, and resync() reads
+everything back with one chained query per device.
+
+Group operations are dispatched to all the devices of a group at once. Each
+device waits for the operations queued before it, then the devices start
+together and the skew between the first and the last channel is reported.
+"""
+
+import threading
+import time
+
+import drivers
+from command_queue import DeviceCommandQueue
+from measurement import parse_reading
+from power_supply import PowerSupply, load_config
+from state_cache import StateCache
+
+class GroupResult:
+    """Outcome of a group operation: completion time of every channel and errors per device"""
+
+    def __init__(self):
+        self.completed = {}  # (device, channel) -> perf_counter() when its command was acknowledged
+        self.errors = {}  # device -> error message
+
+    @property
+    def skew(self):
+        """Seconds between the first and the last channel, None with fewer than two channels"""
+        if len(self.completed) < 2:
+            return None
+        return max(self.completed.values()) - min(self.completed.values())
+
+class AlimentationController:
+    """Instrument operations shared by the GUI and the command line
+
+    Nothing here needs a display. Channels are addressed by their VISA resource
+    name and channel number ("1", "2", ... or None on single channel devices).
+    """
+
+    GROUP_START_TIMEOUT = 5.0  # Seconds a device of a group waits at the start line for the others
+
+    def __init__(self):
+        # Pooled sessions held by connected channels, keyed by (device, channel)
+        self.sessions = {}
+
+        # Last known settings of every channel
+        config = load_config()
+        self.state = StateCache(
+            output_max_age=config.getfloat('state', 'output_max_age_s', fallback=5.0),
+            unlocked_max_age=config.getfloat('state', 'unlocked_max_age_s', fallback=2.0)
+        )
+
+        # Command queue of each device, started on first use
+        self.queues = {}
+        self.queues_lock = threading.Lock()
+        self.group_lock = threading.Lock()
+
+    @staticmethod
+    def channels_of(info):
+        """Channel identifiers of a device, from its *IDN? answer"""
+        return drivers.driver_for(info).channel_ids()
+
+    @staticmethod
+    def iter_channels(devices=None, use_cache=True):
+        """Probe resources and yield (device, info, channel) for every output as devices answer"""
+        for device, info in PowerSupply.iter_available_devices(devices, use_cache=use_cache):
+            if info == "Unable to identify":
+                continue
+            for channel in AlimentationController.channels_of(info):
+                yield device, info, channel
+
+    @staticmethod
+    def channel_groups():
+        """Channel groups of the [groups] section: {name: [(device, channel), ...]}
+
+        Members are separated by commas, a channel is given as RESOURCE@CHANNEL.
+        """
+        config = load_config()
+        groups = {}
+        if 'groups' in config:
+            for name, members in config['groups'].items():
+                targets = []
+                for member in members.split(','):
+                    device, _, channel = member.strip().partition('@')
+                    if device:
+                        targets.append((device, channel.strip() or None))
+                groups[name] = targets
+        return groups
+
+    def submit(self, device, operation, key=None):
+        """Run operation() on the worker thread of a device, after the operations queued before it
+
+        Returns a Future. A waiting operation with the same key is replaced by this one.
+        """
+        with self.queues_lock:
+            command_queue = self.queues.get(device)
+            if command_queue is None:
+                command_queue = self.queues[device] = DeviceCommandQueue(device)
+                command_queue.start()
+        return command_queue.submit(operation, key)
+
+    def queue_setpoint(self, device, name, value, channel=None):
+        """Queue a setpoint write, merged with an unsent write of the same setpoint and channel
+
+        The future resolves to the value actually written.
+        """
+        return self.submit(device, lambda: self.set_setpoint(device, name, value, channel), key=(name, channel))
+
+    def write(self, device, command):
+        with PowerSupply.session(device) as power_supply:
+            power_supply.write(command)
+
+    def query(self, device, command):
+        with PowerSupply.session(device) as power_supply:
+            return power_supply.query(command)
+
+    def identify(self, device):
+        """Ask *IDN? on the pooled session of a device and remember its driver"""
+        with PowerSupply.session(device) as power_supply:
+            idn = power_supply.query(drivers.COMMANDS['identify'])
+        PowerSupply.remember_driver(device, idn)
+        return idn
+
+    def connect(self, device, channel=None):
+        """Take remote control of a channel and keep its session open until disconnect"""
+        power_supply = PowerSupply.acquire(device)
+        try:
+            power_supply.write(power_supply.driver.command('lock', channel))
+        except:
+            power_supply.release(failed=True)
+            self.state.invalidate(device, channel)
+            raise
+        # Setpoints learned while the front panel had control may have changed since
+        self.state.invalidate(device, channel, 'voltage', 'overvoltage', 'overcurrent')
+        self.state.update(device, channel, locked=True)
+
+        previous = self.sessions.pop((device, channel), None)
+        if previous is not None:
+            previous.release()
+        self.sessions[(device, channel)] = power_supply
+
+    def disconnect(self, device, channel=None):
+        """Give control of a channel back to the front panel and release its session"""
+        try:
+            self.write(device, PowerSupply.driver_of(device).command('unlock', channel))
+            self.state.update(device, channel, locked=False)
+        except:
+            self.state.invalidate(device, channel)
+            raise
+        finally:
+            power_supply = self.sessions.pop((device, channel), None)
+            if power_supply is not None:
+                power_supply.release()
+
+    def forget_device(self, device):
+        """Release the sessions of a device that has disappeared, without talking to it"""
+        for key in [key for key in self.sessions if key[0] == device]:
+            self.sessions.pop(key).release(failed=True)
+        self.state.invalidate_device(device)
+
+    def is_connected(self, device, channel=None):
+        return (device, channel) in self.sessions
+
+    def set_setpoint(self, device, name, value, channel=None):
+        """Write a 'voltage', 'overvoltage' or 'overcurrent' setpoint after checking the model limits
+
+        Nothing is sent when the state cache knows the channel already has this value.
+        """
+        driver = PowerSupply.driver_of(device)
+        driver.check_setpoint(name, value)
+        if self.state.get(device, channel, name) == value:
+            return value
+        try:
+            self.write(device, driver.command(name, channel, value=value))
+        except:
+            # The write may or may not have reached the device
+            self.state.invalidate(device, channel, name)
+            raise
+        self.state.update(device, channel, **{name: value})
+        return value
+
+    def set_voltage(self, device, value, channel=None):
+        self.set_setpoint(device, 'voltage', value, channel)
+
+    def set_overvoltage(self, device, value, channel=None):
+        self.set_setpoint(device, 'overvoltage', value, channel)
+
+    def set_overcurrent(self, device, value, channel=None):
+        self.set_setpoint(device, 'overcurrent', value, channel)
+
+    def set_output(self, device, on, channel=None):
+        try:
+            self.write(device, PowerSupply.driver_of(device).command('output', channel,
+                                                                    state="ON" if on else "OFF"))
+        except:
+            self.state.invalidate(device, channel, 'output')
+            raise
+        self.state.update(device, channel, output=on)
+
+    def output_state(self, device, channel=None, use_cache=True):
+        """Return True when the output of a channel is on, from the state cache while it is fresh"""
+        if use_cache:
+            output = self.state.get(device, channel, 'output')
+            if output is not None:
+                return output
+        output = self.query(device, PowerSupply.driver_of(device).command('output_state', channel)) in ('1', 'ON')
+        self.state.update(device, channel, output=output)
+        return output
+
+    def resync(self, device, channels=None):
+        """Read back the settings and output state of channels and refresh the state cache
+
+        All channels are read with one chained channel-list query when the device
+        supports it, otherwise with one chained query per channel. Returns
+        {channel: {field: value}}.
+        """
+        driver = PowerSupply.driver_of(device)
+        channels = list(channels) if channels is not None else driver.channel_ids()
+        fields = list(driver.state_queries)
+
+        readings = {}
+        with PowerSupply.session(device) as power_supply:
+            if len(channels) > 1 and power_supply.supports_channel_lists(channels):
+                queries = driver.state_commands(','.join(channels))
+                rows = power_supply.query_batch(queries, 'state', values_per_reply=len(channels))
+                if rows is None:
+                    rows = [[value.strip() for value in power_supply.query(query).split(',')] for query in queries]
+                for index, channel in enumerate(channels):
+                    readings[channel] = [row[index] for row in rows]
+            else:
+                for channel in channels:
+                    queries = driver.state_commands(channel)
+                    rows = power_supply.query_batch(queries, 'compound')
+                    if rows is None:
+                        rows = [[power_supply.query(query)] for query in queries]
+                    readings[channel] = [row[0] for row in rows]
+
+        states = {}
+        for channel, values in readings.items():
+            state = {}
+            for field, reading in zip(fields, values):
+                if field == 'output':
+                    state[field] = reading.strip().upper() in ('1', 'ON')
+                else:
+                    state[field] = parse_reading(reading)
+            self.state.update(device, channel, **state)
+            states[channel] = state
+        return states
+
+    @staticmethod
+    def write_channels(power_supply, name, channels, **values):
+        """Send a command to several channels of a device, as one channel-list command when supported
+
+        Returns {channel: time the command was acknowledged}.
+        """
+        driver = power_supply.driver
+        if len(channels) > 1 and None not in channels and power_supply.supports_channel_lists(channels):
+            power_supply.write(driver.command(name, ','.join(channels), **values))
+            done = time.perf_counter()
+            return {channel: done for channel in channels}
+
+        done = {}
+        for channel in channels:
+            power_supply.write(driver.command(name, channel, **values))
+            done[channel] = time.perf_counter()
+        return done
+
+    def dispatch(self, targets, operation):
+        """Run operation(power_supply, channels) on every device of a group at the same time
+
+        Each device runs its part on its command queue, after the operations queued
+        before it. Sessions are opened first and the device threads released
+        together, so the commands leave as close together as possible. Returns a
+        GroupResult.
+        """
+        devices = {}
+        for device, channel in targets:
+            devices.setdefault(device, [])
+            if channel not in devices[device]:
+                devices[device].append(channel)
+
+        result = GroupResult()
+        if not devices:
+            return result
+        barrier = threading.Barrier(len(devices))
+
+        def run(device, channels):
+            try:
+                with PowerSupply.session(device) as power_supply:
+                    # Resolve the driver and capabilities before the start line
+                    power_supply.supports_channel_lists(channels)
+                    try:
+                        barrier.wait(self.GROUP_START_TIMEOUT)
+                    except threading.BrokenBarrierError:
+                        pass
+                    return operation(power_supply, channels)
+            except BaseException:
+                # Do not keep the other devices waiting for this one
+                barrier.abort()
+                raise
+
+        # Queued in the same order on every device, so two groups cannot wait on each other
+        with self.group_lock:
+            futures = {device: self.submit(device, lambda device=device, channels=channels: run(device, channels))
+                       for device, channels in devices.items()}
+        for device, future in futures.items():
+            try:
+                for channel, done in future.result().items():
+                    result.completed[(device, channel)] = done
+            except Exception as e:
+                result.errors[device] = str(e)
+        return result
+
+    def record_group_result(self, targets, result, **values):
+        """Bring the state cache in line with what a group operation did"""
+        for device, channel in result.completed:
+            self.state.update(device, channel, **values)
+        for device, channel in targets:
+            if device in result.errors:
+                self.state.invalidate(device, channel, *values)
+        return result
+
+    def set_group_output(self, targets, on):
+        """Switch the outputs of a group on or off together"""
+        state = "ON" if on else "OFF"
+        result = self.dispatch(targets, lambda power_supply, channels:
+                               self.write_channels(power_supply, 'output', channels, state=state))
+        return self.record_group_result(targets, result, output=on)
+
+    def apply_group_setpoints(self, targets, voltage=None, overvoltage=None, overcurrent=None):
+        """Write the same setpoints to every channel of a group, protections before the voltage"""
+        setpoints = [(name, value) for name, value in (('overvoltage', overvoltage),
+                                                       ('overcurrent', overcurrent),
+                                                       ('voltage', voltage)) if value is not None]
+
+        # Refuse the whole group before anything is sent if one model cannot take a value
+        for device in {device for device, channel in targets}:
+            driver = PowerSupply.driver_of(device)
+            for name, value in setpoints:
+                driver.check_setpoint(name, value)
+
+        def apply(power_supply, channels):
+            done = {}
+            for name, value in setpoints:
+                done = self.write_channels(power_supply, name, channels, value=value)
+            return done
+        return self.record_group_result(targets, self.dispatch(targets, apply), **dict(setpoints))
+
+    def measure(self, device, channel=None):
+        """Return the raw (voltage, current, power) readings of a channel"""
+        with PowerSupply.session(device) as power_supply:
+            return power_supply.measure(channel)
+
+    def close(self):
+        """Disconnect every connected channel and close all sessions"""
+        # Let the queued operations finish first
+        with self.queues_lock:
+            queues, self.queues = list(self.queues.values()), {}
+        for command_queue in queues:
+            command_queue.stop()
+        for command_queue in queues:
+            command_queue.join(timeout=5.0)
+
+        for device, channel in list(self.sessions):
+            try:
+                self.disconnect(device, channel)
+            except Exception:
+                pass
+        PowerSupply.close_all()
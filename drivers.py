@@ -0,0 +1,151 @@
+"""Capabilities and SCPI command sets of the supported power supply models
+
+A driver is picked from the *IDN? answer of a device: the registered model id
+found in the answer wins, the longest one when several match. Devices of an
+unknown model get GENERIC_DRIVER, one channel with the standard commands.
+"""
+
+# Standard command set, formatted with the channel suffix and the value to set
+COMMANDS = {
+    'identify': '*IDN?',
+    'lock': 'SYST:LOCK ON{suffix}',
+    'unlock': 'SYST:LOCK OFF{suffix}',
+    'voltage': 'VOLT {value}{suffix}',
+    'overvoltage': 'VOLT:PROT {value}{suffix}',
+    'overcurrent': 'CURR:PROT {value}{suffix}',
+    'output': 'OUTP {state}{suffix}',
+    'output_state': 'OUTP?{suffix}',
+}
+
+# Voltage, current and power readings, in this order
+MEASURE_QUERIES = ('MEAS:VOLT?{suffix}', 'MEAS:CURR?{suffix}', 'MEAS:POW?{suffix}')
+
+# Settings read back by a resync, keyed by the field names of the state cache
+STATE_QUERIES = {
+    'voltage': 'VOLT?{suffix}',
+    'overvoltage': 'VOLT:PROT?{suffix}',
+    'overcurrent': 'CURR:PROT?{suffix}',
+    'output': 'OUTP?{suffix}',
+}
+
+# SCPI list mode: voltage levels and dwell times played by the transient system of the instrument
+LIST_MODE_COMMANDS = {
+    'levels': 'LIST:VOLT {levels}{suffix}',
+    'dwells': 'LIST:DWEL {dwells}{suffix}',
+    'count': 'LIST:COUN 1{suffix}',
+    'mode': 'VOLT:MODE LIST{suffix}',
+    'trigger': 'TRIG:TRAN:SOUR IMM{suffix}',
+    'start': 'INIT:TRAN{suffix}',
+    'abort': 'ABOR:TRAN{suffix}',
+    'fixed': 'VOLT:MODE FIX{suffix}',
+}
+
+class Driver:
+    """Capabilities and command set of a power supply model
+
+    compound_queries and channel_lists tell whether the model answers ';:'
+    chained queries and (@1,2) channel lists: True or False when known, None to
+    probe the device on first use. Limits are the highest accepted setpoints,
+    None when unknown. commands overrides entries of COMMANDS, measure_queries
+    and state_queries replace MEASURE_QUERIES and STATE_QUERIES. Models with a
+    list memory give list_mode (the entries of LIST_MODE_COMMANDS) and its
+    max_list_points.
+    """
+
+    def __init__(self, model, channels=1, max_voltage=None, max_current=None, max_overvoltage=None,
+                 max_overcurrent=None, compound_queries=None, channel_lists=None, commands=None,
+                 measure_queries=MEASURE_QUERIES, state_queries=STATE_QUERIES, list_mode=None,
+                 max_list_points=None):
+        self.model = model
+        self.channels = channels
+        self.limits = {
+            'voltage': max_voltage,
+            'overvoltage': max_overvoltage if max_overvoltage is not None else max_voltage,
+            'overcurrent': max_overcurrent if max_overcurrent is not None else max_current,
+        }
+        self.compound_queries = compound_queries
+        self.channel_lists = channel_lists if channels > 1 else False
+        self.commands = dict(COMMANDS, **(commands or {}))
+        self.measure_queries = measure_queries
+        self.state_queries = state_queries
+        self.list_mode = list_mode
+        self.max_list_points = max_list_points
+
+    def channel_ids(self):
+        """Channel identifiers: "1", "2", ... or [None] for single channel devices"""
+        if self.channels > 1:
+            return [str(channel) for channel in range(1, self.channels + 1)]
+        return [None]
+
+    @staticmethod
+    def suffix(channel):
+        return f' (@{channel})' if channel else ''
+
+    def command(self, name, channel=None, **values):
+        return self.commands[name].format(suffix=self.suffix(channel), **values)
+
+    def measure_commands(self, channel=None):
+        """Queries returning the voltage, current and power of one channel or a channel list"""
+        return [query.format(suffix=self.suffix(channel)) for query in self.measure_queries]
+
+    def state_commands(self, channel=None):
+        """Queries reading back the fields of state_queries, for one channel or a channel list"""
+        return [query.format(suffix=self.suffix(channel)) for query in self.state_queries.values()]
+
+    def supports_list(self, steps):
+        """Whether a profile of (voltage, dwell) steps fits in the list memory of the model"""
+        return self.list_mode is not None and (self.max_list_points is None or len(steps) <= self.max_list_points)
+
+    def list_command(self, name, channel=None, **values):
+        return self.list_mode[name].format(suffix=self.suffix(channel), **values)
+
+    def list_upload_commands(self, steps, channel=None):
+        """Commands loading (voltage, dwell) steps into the list memory, ready to be started"""
+        levels = ','.join(f"{voltage:g}" for voltage, dwell in steps)
+        dwells = ','.join(f"{dwell:g}" for voltage, dwell in steps)
+        return [self.list_command('levels', channel, levels=levels),
+                self.list_command('dwells', channel, dwells=dwells),
+                self.list_command('count', channel),
+                self.list_command('mode', channel),
+                self.list_command('trigger', channel)]
+
+    def batch_support(self):
+        """Known batch capabilities, in the {kind: bool} form used by PowerSupply.query_batch"""
+        support = {}
+        if self.compound_queries is not None:
+            support['compound'] = self.compound_queries
+        if self.channel_lists is not None:
+            support['channel_list'] = self.channel_lists
+        return support
+
+    def check_setpoint(self, name, value):
+        """Raise ValueError for a setpoint the model cannot accept"""
+        limit = self.limits.get(name)
+        if value < 0:
+            raise ValueError(f"{name} setpoint cannot be negative")
+        if limit is not None and value > limit:
+            raise ValueError(f"{name} setpoint {value} exceeds the {limit} limit of the {self.model}")
+
+GENERIC_DRIVER = Driver('Generic SCPI power supply')
+
+# Registered drivers keyed by the model id found in the *IDN? answer
+DRIVERS = {}
+
+def register(driver):
+    DRIVERS[driver.model] = driver
+    return driver
+
+def driver_for(idn):
+    """Return the driver of the longest registered model id found in an *IDN? answer"""
+    matches = [model for model in DRIVERS if model in idn]
+    if not matches:
+        return GENERIC_DRIVER
+    return DRIVERS[max(matches, key=len)]
+
+# Protection limits can be set up to 110 % of the rated values
+register(Driver('PS 2042-06 B', channels=1, max_voltage=42.0, max_current=6.0,
+                max_overvoltage=46.2, max_overcurrent=6.6))
+register(Driver('PS 2342-06 B', channels=2, max_voltage=42.0, max_current=6.0,
+                max_overvoltage=46.2, max_overcurrent=6.6))
+register(Driver('IT6018C-1500-40', channels=1, max_voltage=1500.0, max_current=40.0,
+                max_overvoltage=1650.0, max_overcurrent=44.0, compound_queries=True))
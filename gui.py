@@ -0,0 +1,2157 @@
+import customtkinter as ctk
+import os
+import json
+import time
+import queue
+import threading
+import logging
+from tkinter import filedialog
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from power_supply import CONFIG_PATH, load_config, DeviceNameResolver, PowerSupply
+from measurement import MeasurementStore, MinMaxDecimator, MeasurementRecorder, MeasurementEngine
+from controller import AlimentationController
+from control_server import ControlServer
+from sequence import Profile, SequenceRunner
+
+class ChannelChart(ctk.CTkToplevel):
+    """Pop-out live chart of the voltage, current and power history of a channel"""
+
+    TRACES = (('voltage', 'V', '#1f77b4'), ('current', 'A', '#d62728'), ('power', 'W', '#2ca02c'))
+    WIDTH = 760
+    PLOT_LEFT = 80  # Room for the axis labels
+    PLOT_RIGHT = 10
+    PLOT_HEIGHT = 120
+    PLOT_SPACING = 20
+
+    def __init__(self, master, title, history, fps):
+        super().__init__(master)
+        self.title(title)
+        height = len(self.TRACES) * (self.PLOT_HEIGHT + self.PLOT_SPACING) + 30
+        self.geometry(f"{self.WIDTH + 20}x{height + 20}")
+        self.resizable(False, False)
+
+        self.history = history
+        self.interval = max(int(1000 / fps), 1)
+        self.drawn_total = None
+        plot_width = self.WIDTH - self.PLOT_LEFT - self.PLOT_RIGHT
+
+        dark = ctk.get_appearance_mode() == "Dark"
+        background, foreground = ("#2b2b2b", "#dce4ee") if dark else ("#f9f9fa", "#1a1a1a")
+        self.canvas = ctk.CTkCanvas(self, width=self.WIDTH, height=height,
+                                    background=background, highlightthickness=0)
+        self.canvas.place(x=10, y=10)
+
+        # Canvas items are created once and only moved or relabelled afterwards
+        self.plots = []
+        for row, (field, unit, color) in enumerate(self.TRACES):
+            top = 10 + row * (self.PLOT_HEIGHT + self.PLOT_SPACING)
+            bottom = top + self.PLOT_HEIGHT
+            self.canvas.create_rectangle(self.PLOT_LEFT, top, self.PLOT_LEFT + plot_width, bottom,
+                                         outline=foreground)
+            self.plots.append({
+                'field': field,
+                'unit': unit,
+                'top': top,
+                'bottom': bottom,
+                # Two points per bucket, so half a bucket per pixel
+                'decimator': MinMaxDecimator(field, plot_width // 2),
+                'line': self.canvas.create_line(0, 0, 0, 0, fill=color, width=1, state="hidden"),
+                'high_label': self.canvas.create_text(self.PLOT_LEFT - 5, top, anchor="ne",
+                                                      fill=foreground, text=""),
+                'low_label': self.canvas.create_text(self.PLOT_LEFT - 5, bottom, anchor="se",
+                                                     fill=foreground, text=""),
+                'latest_label': self.canvas.create_text(self.PLOT_LEFT + 5, top + 3, anchor="nw",
+                                                        fill=color, text=f"-- {unit}"),
+            })
+        self.span_label = self.canvas.create_text(self.WIDTH - self.PLOT_RIGHT, height - 5, anchor="se",
+                                                  fill=foreground, text="")
+
+        self.refresh_id = None
+        self.refresh()
+
+    def refresh(self):
+        """Redraw at the capped frame rate, and only when new samples arrived"""
+        if self.history.total != self.drawn_total:
+            self.drawn_total = self.history.total
+            self.draw()
+        self.refresh_id = self.after(self.interval, self.refresh)
+
+    def destroy(self):
+        if self.refresh_id is not None:
+            self.after_cancel(self.refresh_id)
+            self.refresh_id = None
+        super().destroy()
+
+    def draw(self):
+        plot_width = self.WIDTH - self.PLOT_LEFT - self.PLOT_RIGHT
+        latest = self.history.latest()
+        if latest is None:
+            return
+        # Oldest timestamp, read straight from the ring buffer
+        start, end = self.history.segments('timestamp')[0][0], latest[0]
+        span = max(end - start, 1e-9)
+        self.canvas.itemconfigure(self.span_label, text=f"Last {end - start:.1f} s")
+
+        for plot, value in zip(self.plots, latest[1:]):
+            decimator = plot['decimator']
+            decimator.update(self.history)
+            points = decimator.points(since=start)
+            self.canvas.itemconfigure(plot['latest_label'], text=f"{value:g} {plot['unit']}")
+            if len(points) < 2:
+                continue
+
+            low = min(point[1] for point in points)
+            high = max(point[1] for point in points)
+            if high - low < 1e-12:
+                # Flat trace: give it some room around its value
+                margin = max(abs(high) * 0.05, 1e-3)
+                low, high = low - margin, high + margin
+            scale = (plot['bottom'] - plot['top']) / (high - low)
+
+            coordinates = []
+            for timestamp, reading in points:
+                coordinates.append(self.PLOT_LEFT + (timestamp - start) / span * plot_width)
+                coordinates.append(plot['bottom'] - (reading - low) * scale)
+            self.canvas.coords(plot['line'], *coordinates)
+            self.canvas.itemconfigure(plot['line'], state="normal")
+            self.canvas.itemconfigure(plot['high_label'], text=f"{high:.4g} {plot['unit']}")
+            self.canvas.itemconfigure(plot['low_label'], text=f"{low:.4g} {plot['unit']}")
+
+class LogFileSink:
+    """Rotating log file written by a background thread, with millisecond timestamps"""
+
+    def __init__(self, path, max_bytes, backup_count):
+        self.handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count,
+                                           encoding='utf-8', delay=True)
+        self.handler.setFormatter(logging.Formatter('%(asctime)s.%(msecs)03d   %(message)s',
+                                                    '%Y-%m-%d %H:%M:%S'))
+
+        # Records are timestamped when queued and formatted by the listener thread
+        self.queue = queue.Queue()
+        self.listener = QueueListener(self.queue, self.handler)
+        self.logger = logging.getLogger('alimentation')
+        self.logger.setLevel(logging.INFO)
+        self.logger.propagate = False
+        self.queue_handler = QueueHandler(self.queue)
+        self.logger.addHandler(self.queue_handler)
+        self.listener.start()
+
+    def write(self, message):
+        self.logger.info(message)
+
+    def close(self):
+        self.logger.removeHandler(self.queue_handler)
+        self.listener.stop()
+        self.handler.close()
+
+class DiagnosticsWindow(ctk.CTkToplevel):
+    """Per-command latency statistics of the SCPI traffic, with JSON export"""
+
+    REFRESH_INTERVAL = 1000  # Milliseconds
+    COLUMNS = (('resource', 34), ('command', 24), ('outcome', 8), ('count', 7),
+               ('p50_ms', 9), ('p95_ms', 9), ('p99_ms', 9), ('max_ms', 9))
+
+    def __init__(self, master):
+        super().__init__(master)
+        self.title("Command Statistics")
+        self.geometry("1000x420")
+        self.resizable(False, False)
+        # The default close button destroys the window from Tcl, without calling destroy()
+        self.protocol("WM_DELETE_WINDOW", self.destroy)
+
+        self.enable_switch = ctk.CTkSwitch(self, text="Collect", command=self.toggle_collection,
+                                           width=90, height=30)
+        self.enable_switch.place(x=10, y=10)
+        if PowerSupply.command_stats is not None:
+            self.enable_switch.select()
+
+        self.reset_button = ctk.CTkButton(self, text="Reset", command=self.reset, width=100, height=30)
+        self.reset_button.place(x=120, y=10)
+
+        self.export_button = ctk.CTkButton(self, text="Export JSON", command=self.export, width=100, height=30)
+        self.export_button.place(x=230, y=10)
+
+        self.textbox = ctk.CTkTextbox(self, width=980, height=360, font=("Courier New", 12), wrap="none")
+        self.textbox.place(x=10, y=50)
+
+        self.shown = None
+        self.refresh_id = None
+        self.refresh()
+
+    def destroy(self):
+        if self.refresh_id is not None:
+            self.after_cancel(self.refresh_id)
+            self.refresh_id = None
+        super().destroy()
+
+    def toggle_collection(self):
+        PowerSupply.enable_command_stats(bool(self.enable_switch.get()))
+        self.shown = None
+
+    def reset(self):
+        if PowerSupply.command_stats is not None:
+            PowerSupply.command_stats.reset()
+        self.shown = None
+
+    def export(self):
+        stats = PowerSupply.command_stats
+        if stats is None:
+            self.master.log_message("Command statistics are not being collected")
+            return
+        path = filedialog.asksaveasfilename(parent=self, defaultextension=".json",
+                                            filetypes=[("JSON", "*.json")],
+                                            initialfile=time.strftime("command_stats_%Y%m%d_%H%M%S.json"))
+        if not path:
+            return
+        try:
+            stats.export_json(path)
+            self.master.log_message(f"Command statistics exported to {path}")
+        except OSError as e:
+            self.master.log_message(f"Error exporting command statistics: {str(e)}")
+
+    def refresh(self):
+        stats = PowerSupply.command_stats
+        if stats is None:
+            text = "Collection is disabled."
+        else:
+            rows = stats.snapshot()
+            lines = [''.join(name.ljust(width) for name, width in self.COLUMNS)]
+            for row in rows:
+                lines.append(''.join(str(row[name])[:width - 1].ljust(width) for name, width in self.COLUMNS))
+            text = '\n'.join(lines) if rows else "No command issued yet."
+
+        # Rewriting an unchanged table would reset the scroll position
+        if text != self.shown:
+            self.shown = text
+            self.textbox.delete("1.0", "end")
+            self.textbox.insert("1.0", text)
+        self.refresh_id = self.after(self.REFRESH_INTERVAL, self.refresh)
+
+class GroupWindow(ctk.CTkToplevel):
+    """Synchronized output and setpoint actions on a group of channels"""
+
+    def __init__(self, master, group_names):
+        super().__init__(master)
+        self.title("Channel Groups")
+        self.geometry("620x130")
+        self.resizable(False, False)
+
+        self.group_menu = ctk.CTkOptionMenu(self, values=group_names, width=280, height=30)
+        self.group_menu.place(x=10, y=10)
+
+        self.on_button = ctk.CTkButton(self, text="All ON", width=100, height=30,
+                                       command=lambda: self.run('output', on=True))
+        self.on_button.place(x=300, y=10)
+
+        self.off_button = ctk.CTkButton(self, text="All OFF", width=100, height=30,
+                                        command=lambda: self.run('output', on=False))
+        self.off_button.place(x=410, y=10)
+
+        self.entries = {}
+        for index, (name, text) in enumerate((('overvoltage', "OVP (V):"), ('overcurrent', "OCP (A):"),
+                                              ('voltage', "Voltage (V):"))):
+            label = ctk.CTkLabel(self, text=text, width=80, height=30, anchor="e")
+            label.place(x=10 + index * 150, y=50)
+            entry = ctk.CTkEntry(self, width=60, height=30)
+            entry.place(x=95 + index * 150, y=50)
+            self.entries[name] = entry
+
+        self.apply_button = ctk.CTkButton(self, text="Apply", width=100, height=30,
+                                          command=lambda: self.run('setpoints'))
+        self.apply_button.place(x=460, y=50)
+
+        self.status_label = ctk.CTkLabel(self, text="", width=600, height=30, anchor="w")
+        self.status_label.place(x=10, y=90)
+
+    def run(self, action, on=None):
+        if action == 'output':
+            self.master.run_group_action(self.group_menu.get(), action, on=on)
+            return
+
+        values = {}
+        for name, entry in self.entries.items():
+            text = entry.get().strip()
+            if not text:
+                continue
+            try:
+                values[name] = float(text)
+            except ValueError:
+                self.status_label.configure(text=f"Invalid {name} value")
+                return
+        if not values:
+            self.status_label.configure(text="Enter at least one setpoint")
+            return
+        self.master.run_group_action(self.group_menu.get(), action, **values)
+
+    def show_status(self, text):
+        self.status_label.configure(text=text)
+
+class SequenceWindow(ctk.CTkToplevel):
+    """Ramp, staircase or CSV table profile played on one channel"""
+
+    PROFILES = ("Ramp", "Staircase", "Table from CSV")
+    MODES = {"Auto": 'auto', "Host timed": 'host', "Instrument list": 'list'}
+
+    def __init__(self, master, title, device, info, channel):
+        super().__init__(master)
+        self.title(f"Sequence - {title}")
+        self.geometry("560x220")
+        self.resizable(False, False)
+        self.device = device
+        self.info = info
+        self.channel = channel
+
+        self.profile_menu = ctk.CTkOptionMenu(self, values=list(self.PROFILES), width=160, height=30)
+        self.profile_menu.place(x=10, y=10)
+        self.mode_menu = ctk.CTkOptionMenu(self, values=list(self.MODES), width=160, height=30)
+        self.mode_menu.place(x=180, y=10)
+
+        # Ramps use start, stop, duration and step time; staircases start, stop, step and step time
+        self.entries = {}
+        fields = (('start', "Start (V):", 10, 50), ('stop', "Stop (V):", 190, 50), ('step', "Step (V):", 370, 50),
+                  ('duration', "Duration (s):", 10, 90), ('interval', "Step time (s):", 190, 90))
+        for name, text, x, y in fields:
+            label = ctk.CTkLabel(self, text=text, width=90, height=30, anchor="e")
+            label.place(x=x, y=y)
+            entry = ctk.CTkEntry(self, width=70, height=30)
+            entry.place(x=x + 95, y=y)
+            self.entries[name] = entry
+        self.entries['interval'].insert(0, "0.1")
+
+        self.csv_entry = ctk.CTkEntry(self, width=430, height=30, placeholder_text="CSV file: voltage,dwell_s")
+        self.csv_entry.place(x=10, y=130)
+        self.browse_button = ctk.CTkButton(self, text="Browse", command=self.browse, width=100, height=30)
+        self.browse_button.place(x=450, y=130)
+
+        self.start_button = ctk.CTkButton(self, text="Start", command=self.start, width=100, height=30)
+        self.start_button.place(x=10, y=170)
+        self.stop_button = ctk.CTkButton(self, text="Stop", command=self.stop, width=100, height=30)
+        self.stop_button.place(x=120, y=170)
+        self.status_label = ctk.CTkLabel(self, text="", width=320, height=30, anchor="w")
+        self.status_label.place(x=230, y=170)
+
+    def browse(self):
+        path = filedialog.askopenfilename(parent=self, filetypes=[("CSV", "*.csv"), ("All files", "*.*")])
+        if path:
+            self.csv_entry.delete(0, "end")
+            self.csv_entry.insert(0, path)
+
+    def value(self, name):
+        try:
+            return float(self.entries[name].get())
+        except ValueError:
+            raise ValueError(f"Invalid {name} value")
+
+    def build_profile(self):
+        kind = self.profile_menu.get()
+        if kind == "Ramp":
+            return Profile.ramp(self.value('start'), self.value('stop'), self.value('duration'),
+                                self.value('interval'))
+        if kind == "Staircase":
+            return Profile.staircase(self.value('start'), self.value('stop'), self.value('step'),
+                                     self.value('interval'))
+        return Profile.from_csv(self.csv_entry.get())
+
+    def start(self):
+        try:
+            profile = self.build_profile()
+        except (OSError, ValueError) as e:
+            self.show_status(str(e))
+            return
+        self.master.start_sequence(self.device, self.info, self.channel, profile,
+                                   self.MODES[self.mode_menu.get()])
+
+    def stop(self):
+        self.master.stop_sequence(self.device, self.channel)
+
+    def show_status(self, text):
+        self.status_label.configure(text=text)
+
+class RefreshScheduler:
+    """Applies the control updates of the listed channels at most fps times per second
+
+    Updates arriving between two flushes are merged per control option, so when
+    samples come in faster than the screen refreshes, or the event loop falls
+    behind, only the latest value of each label reaches Tk.
+    """
+
+    def __init__(self, root, fps=30.0):
+        self.root = root
+        self.interval = 1.0 / max(fps, 1.0)
+        self.dirty = {}  # ChannelController -> None, an ordered set of channels with pending updates
+        self.scheduled = False
+        self.last_flush = 0.0
+
+    def mark(self, controls):
+        self.dirty[controls] = None
+        if not self.scheduled:
+            self.scheduled = True
+            delay = max(0.0, self.last_flush + self.interval - time.perf_counter())
+            self.root.after(int(delay * 1000), self.flush)
+
+    def flush(self):
+        self.scheduled = False
+        self.last_flush = time.perf_counter()
+        dirty, self.dirty = self.dirty, {}
+        for controls in dirty:
+            controls.flush()
+
+class ChannelController:
+    """Identity, display state and protection tracking of one listed channel
+
+    Listed channels are indexed by (resource, channel) in AlimentationTool.channel_index.
+    The widgets belong to the row currently showing the channel, None while it
+    is scrolled out of view: view holds the last options given to each control
+    and entries the text typed in the entry fields, so any row can take it over.
+    """
+
+    __slots__ = ('device', 'info', 'channel', 'device_index', 'title', 'short_title',
+                 'view', 'entries', 'row', 'protections', 'pending', 'refresher')
+
+    # Options applied at once rather than on the next frame, so a button disabled by a click cannot be clicked twice
+    IMMEDIATE_OPTIONS = ('state', 'selected')
+
+    # Options of the controls of a channel that was just listed
+    DEFAULT_VIEW = {
+        'connection_status': {'text': "Disconnected", 'text_color': "red"},
+        'power_status': {'text': "Power OFF", 'text_color': "red"},
+        'connect_button': {'state': "normal"},
+        'disconnect_button': {'state': "disabled"},
+        'monitor_switch': {'state': "disabled", 'selected': False},
+        'rate_entry': {'state': "disabled"},
+        'power_on_button': {'state': "disabled"},
+        'power_off_button': {'state': "disabled"},
+        'voltage_entry': {'state': "disabled"},
+        'set_voltage_button': {'state': "disabled"},
+        'overvolt_entry': {'state': "disabled"},
+        'set_overvolt_button': {'state': "disabled"},
+        'overcurr_entry': {'state': "disabled"},
+        'set_overcurr_button': {'state': "disabled"},
+        'measure_button': {'state': "disabled"},
+        'voltage_measure_label': {'text': "Voltage: -- V"},
+        'current_measure_label': {'text': "Current: -- A"},
+        'power_measure_label': {'text': "Power: -- W"},
+        'ovp_status': {'text': "Set OVP", 'text_color': "red"},
+        'ocp_status': {'text': "Set OCP", 'text_color': "red"},
+    }
+
+    def __init__(self, device, info, channel, device_index, title, short_title, refresher=None):
+        self.device = device
+        self.info = info
+        self.channel = channel
+        self.device_index = device_index
+        self.title = title
+        self.short_title = short_title
+        self.view = {name: dict(options) for name, options in self.DEFAULT_VIEW.items()}
+        self.entries = {}
+        self.row = None
+        self.protections = {'ovp': False, 'ocp': False}
+        self.pending = {}  # Options waiting for the next flush of the refresher, per control
+        self.refresher = refresher
+
+    @property
+    def key(self):
+        return (self.device, self.channel)
+
+    @property
+    def protections_set(self):
+        """Whether both OVP and OCP have been set, which unlocks the voltage controls"""
+        return self.protections['ovp'] and self.protections['ocp']
+
+    def configure(self, name, **options):
+        """Configure a control, on screen if a row shows the channel and for when one will
+
+        Options equal to the current ones are ignored. Texts and colours are
+        drawn on the next frame of the refresher, replacing any value still
+        waiting for it.
+        """
+        current = self.view.setdefault(name, {})
+        changed = {key: value for key, value in options.items() if key not in current or current[key] != value}
+        if not changed:
+            return
+        current.update(changed)
+        if self.row is None:
+            return
+
+        immediate = {key: changed.pop(key) for key in self.IMMEDIATE_OPTIONS if key in changed}
+        if immediate:
+            self.row.apply(name, immediate)
+        if changed:
+            if self.refresher is None:
+                self.row.apply(name, changed)
+                return
+            self.pending.setdefault(name, {}).update(changed)
+            self.refresher.mark(self)
+
+    def flush(self):
+        """Draw the options collected since the last frame"""
+        pending, self.pending = self.pending, {}
+        if self.row is not None:
+            for name, options in pending.items():
+                self.row.apply(name, options)
+
+    def entry_text(self, name):
+        if self.row is not None and name in self.row.widgets:
+            return self.row.widgets[name].get()
+        return self.entries.get(name, '')
+
+class ChannelRow(ctk.CTkFrame):
+    """Recycled panel drawing the controls of whichever channel is bound to it
+
+    The state of a channel lives in its ChannelController, so a row can be
+    handed to another channel while scrolling.
+    """
+
+    HEIGHT = 160  # Slot height in the device list, including the spacing below the panel
+    ENTRIES = ('voltage_entry', 'overvolt_entry', 'overcurr_entry', 'rate_entry')
+
+    def __init__(self, master, app):
+        super().__init__(master, width=780, height=self.HEIGHT - 5)
+        self.app = app
+        self.item = None
+        self.widgets = {}
+        self.shown = {}  # Options currently displayed by each control, to skip unchanged ones
+        self.create_widgets(app)
+
+    def create_widgets(self, app):
+        # Line 1: Device name with channel if applicable and connection status
+        self.name_label = ctk.CTkLabel(self, text="", width=200, height=30)
+        self.name_label.place(x=10, y=5)
+
+        # Status indicators - with separator
+        ctk.CTkLabel(self, text="Status:", width=60, height=30).place(x=530, y=5)
+        self.add('connection_status', ctk.CTkLabel(self, text="Disconnected", width=100, height=30,
+                                                    text_color="red", corner_radius=8), 580, 5)
+        ctk.CTkLabel(self, text="|", width=10, height=30).place(x=680, y=5)
+        self.add('power_status', ctk.CTkLabel(self, text="Power OFF", width=80, height=30,
+                                               text_color="red", corner_radius=8), 690, 5)
+
+        # Line 2: Control buttons
+        self.add('connect_button', ctk.CTkButton(self, text="Connect", width=100, height=30,
+                                                  command=lambda: self.call(app.connect_device)), 10, 40)
+        self.add('disconnect_button', ctk.CTkButton(self, text="Disconnect", width=100, height=30,
+                                                     command=lambda: self.call(app.disconnect_device)), 120, 40)
+
+        # Continuous monitoring controls
+        self.add('monitor_switch', ctk.CTkSwitch(self, text="Monitor", width=90, height=30,
+                                                  command=self.monitor_toggled), 230, 40)
+        rate_entry = self.add('rate_entry', ctk.CTkEntry(self, width=50, height=30,
+                                                          placeholder_text=str(app.default_rate)), 330, 40)
+        rate_entry.bind("<Return>", lambda event: self.call(app.update_monitoring_rate))
+        ctk.CTkLabel(self, text="Hz", width=20, height=30).place(x=385, y=40)
+
+        self.add('chart_button', ctk.CTkButton(self, text="Chart", width=60, height=30,
+                                                command=lambda: self.call(app.open_chart)), 420, 40)
+        self.add('sequence_button', ctk.CTkButton(self, text="Sequence", width=90, height=30,
+                                                   command=lambda: self.call(app.open_sequence)), 490, 40)
+        self.add('power_on_button', ctk.CTkButton(self, text="Power ON", width=80, height=30,
+                                                   command=lambda: self.call(app.power_on)), 600, 40)
+        self.add('power_off_button', ctk.CTkButton(self, text="Power OFF", width=80, height=30,
+                                                    command=lambda: self.call(app.power_off)), 690, 40)
+
+        # Line 3: Voltage, OVP, and OCP controls
+        ctk.CTkLabel(self, text="Voltage:", width=60, height=30).place(x=10, y=80)
+        self.add('voltage_entry', ctk.CTkEntry(self, width=60, height=30, placeholder_text="0.0"), 70, 80)
+        self.add('set_voltage_button', ctk.CTkButton(
+            self, text="Set Voltage", width=80, height=30,
+            command=lambda: self.call(app.set_voltage, 'voltage_entry')), 140, 80)
+
+        ctk.CTkLabel(self, text="Over Voltage Limit:", width=120, height=30).place(x=230, y=80)
+        self.add('overvolt_entry', ctk.CTkEntry(self, width=60, height=30, placeholder_text="0.0"), 350, 80)
+        self.add('set_overvolt_button', ctk.CTkButton(
+            self, text="Set OVP", width=60, height=30,
+            command=lambda: self.call(app.set_overvoltage, 'overvolt_entry')), 420, 80)
+
+        ctk.CTkLabel(self, text="Over Current Limit:", width=120, height=30).place(x=490, y=80)
+        self.add('overcurr_entry', ctk.CTkEntry(self, width=60, height=30, placeholder_text="0.0"), 610, 80)
+        self.add('set_overcurr_button', ctk.CTkButton(
+            self, text="Set OCP", width=60, height=30,
+            command=lambda: self.call(app.set_overcurrent, 'overcurr_entry')), 680, 80)
+
+        # Line 4: Measurement section
+        self.add('measure_button', ctk.CTkButton(self, text="Measure", width=80, height=30,
+                                                  command=lambda: self.call(app.measure_values)), 10, 120)
+        self.add('voltage_measure_label', ctk.CTkLabel(self, text="Voltage: -- V", width=120, height=30), 100, 120)
+        self.add('current_measure_label', ctk.CTkLabel(self, text="Current: -- A", width=120, height=30), 230, 120)
+        self.add('power_measure_label', ctk.CTkLabel(self, text="Power: -- W", width=120, height=30), 360, 120)
+
+        # OVP and OCP status indicators
+        ctk.CTkLabel(self, text="Protections:", width=60, height=30).place(x=530, y=120)
+        self.add('ovp_status', ctk.CTkLabel(self, text="Set OVP", width=80, height=30, text_color="red"), 600, 120)
+        ctk.CTkLabel(self, text="|", width=10, height=30).place(x=680, y=120)
+        self.add('ocp_status', ctk.CTkLabel(self, text="Set OCP", width=80, height=30, text_color="red"), 690, 120)
+
+    def add(self, name, widget, x, y):
+        widget.place(x=x, y=y)
+        self.widgets[name] = widget
+        return widget
+
+    def call(self, handler, *entries):
+        """Run a handler on the bound channel: handler(device, *entry widgets, info, channel)"""
+        item = self.item
+        if item is None:
+            return
+        handler(item.device, *[self.widgets[name] for name in entries], item.info, item.channel)
+
+    def monitor_toggled(self):
+        if self.item is not None:
+            selected = bool(self.widgets['monitor_switch'].get())
+            self.item.view['monitor_switch']['selected'] = selected
+            self.shown.setdefault('monitor_switch', {})['selected'] = selected
+        self.call(self.app.toggle_monitoring)
+
+    def title_of(self, item):
+        return item.title
+
+    def bind_item(self, item):
+        """Show a channel on this row, replacing the one shown before"""
+        if self.item is item:
+            return
+        self.unbind_item()
+        self.item = item
+        item.row = self
+        # The whole view is drawn below, updates waiting for the refresher are part of it
+        item.pending.clear()
+        title = self.title_of(item)
+        if self.name_label.cget("text") != title:
+            self.name_label.configure(text=title)
+
+        # Entries take their text back before their state, a disabled entry ignores insert()
+        for name in self.ENTRIES:
+            entry = self.widgets.get(name)
+            if entry is None:
+                continue
+            self.apply(name, {'state': "normal"})
+            entry.delete(0, "end")
+            text = item.entries.get(name)
+            if text:
+                entry.insert(0, text)
+        for name, options in item.view.items():
+            self.apply(name, options)
+
+    def unbind_item(self):
+        """Keep the text typed in the entries of the shown channel and release it"""
+        item = self.item
+        if item is None:
+            return
+        for name in self.ENTRIES:
+            entry = self.widgets.get(name)
+            if entry is not None:
+                item.entries[name] = entry.get()
+        if item.row is self:
+            item.row = None
+            item.pending.clear()
+        self.item = None
+
+    def apply(self, name, options):
+        widget = self.widgets.get(name)
+        if widget is None:
+            return
+        shown = self.shown.setdefault(name, {})
+        options = {key: value for key, value in options.items() if key not in shown or shown[key] != value}
+        if not options:
+            return
+        shown.update(options)
+        selected = options.pop('selected', None)
+        if options:
+            widget.configure(**options)
+        if selected is True:
+            widget.select()
+        elif selected is False:
+            widget.deselect()
+
+class CompactChannelRow(ChannelRow):
+    """One-line row of the compact device list: status, readings and the main buttons"""
+
+    HEIGHT = 32
+    ENTRIES = ()
+    # Column titles of the compact list and their x position in the row
+    COLUMNS = (("Channel", 5), ("Status", 185), ("Output", 270), ("Voltage", 345), ("Current", 405), ("Power", 465))
+
+    def create_widgets(self, app):
+        self.name_label = ctk.CTkLabel(self, text="", width=180, height=26, anchor="w")
+        self.name_label.place(x=5, y=1)
+        self.add('connection_status', ctk.CTkLabel(self, text="Disconnected", width=85, height=26,
+                                                    text_color="red"), 185, 1)
+        self.add('power_status', ctk.CTkLabel(self, text="Power OFF", width=75, height=26,
+                                               text_color="red"), 270, 1)
+        self.add('voltage_measure_label', ctk.CTkLabel(self, text="-- V", width=60, height=26), 345, 1)
+        self.add('current_measure_label', ctk.CTkLabel(self, text="-- A", width=60, height=26), 405, 1)
+        self.add('power_measure_label', ctk.CTkLabel(self, text="-- W", width=60, height=26), 465, 1)
+        self.add('connect_button', ctk.CTkButton(self, text="Connect", width=65, height=26,
+                                                  command=lambda: self.call(app.connect_device)), 530, 1)
+        self.add('disconnect_button', ctk.CTkButton(self, text="Disconnect", width=75, height=26,
+                                                     command=lambda: self.call(app.disconnect_device)), 600, 1)
+        self.add('power_on_button', ctk.CTkButton(self, text="ON", width=30, height=26,
+                                                   command=lambda: self.call(app.power_on)), 680, 1)
+        self.add('power_off_button', ctk.CTkButton(self, text="OFF", width=35, height=26,
+                                                    command=lambda: self.call(app.power_off)), 715, 1)
+        # The setpoints and monitoring controls stay on the full panel
+        self.add('details_button', ctk.CTkButton(self, text="...", width=22, height=26,
+                                                  command=lambda: app.show_channel_details(self.item)), 755, 1)
+
+    def title_of(self, item):
+        return item.short_title
+
+    def apply(self, name, options):
+        # Readings are shown without their "Voltage: " style prefix
+        if 'text' in options and name.endswith('_measure_label'):
+            options = dict(options, text=options['text'].split(': ', 1)[-1])
+        super().apply(name, options)
+
+class DeviceList(ctk.CTkFrame):
+    """Scrollable list of channels, drawing only the visible ones on a pool of recycled rows
+
+    Scrolling moves by whole rows and rebinds the pool to the channels now in
+    view, so the widget count depends on the visible rows, not on the rack size.
+    """
+
+    def __init__(self, app, items, visible_rows, row_class=ChannelRow):
+        super().__init__(app, width=800, height=1, fg_color="transparent")
+        self.app = app
+        self.items = items
+        self.visible_rows = max(visible_rows, 1)
+        self.row_class = row_class
+        self.rows = []
+        self.top = 0
+        self.scrollbar = ctk.CTkScrollbar(self, orientation="vertical", width=8, command=self.on_scrollbar)
+        self.bind_all("<MouseWheel>", self.on_mouse_wheel, add="+")
+        self.bind_all("<Button-4>", self.on_mouse_wheel, add="+")
+        self.bind_all("<Button-5>", self.on_mouse_wheel, add="+")
+
+    @property
+    def shown_rows(self):
+        return min(len(self.items), self.visible_rows)
+
+    @property
+    def height(self):
+        return self.shown_rows * self.row_class.HEIGHT
+
+    def set_mode(self, row_class, visible_rows):
+        """Switch between the full panels and the compact table, rebuilding the row pool"""
+        for row in self.rows:
+            row.unbind_item()
+            row.destroy()
+        self.rows = []
+        self.row_class = row_class
+        self.visible_rows = max(visible_rows, 1)
+        self.refresh()
+
+    def clear(self):
+        for row in self.rows:
+            row.unbind_item()
+            row.place_forget()
+        self.top = 0
+        self.refresh()
+
+    def scroll_to(self, top):
+        top = max(0, min(top, len(self.items) - self.shown_rows))
+        if top != self.top:
+            self.top = top
+            self.refresh()
+
+    def show_item(self, item):
+        """Scroll just enough to bring a channel into view"""
+        index = self.items.index(item)
+        if index < self.top:
+            self.scroll_to(index)
+        elif index >= self.top + self.shown_rows:
+            self.scroll_to(index - self.shown_rows + 1)
+
+    def refresh(self):
+        """Bind every slot of the pool to the channel now at its position"""
+        self.top = max(0, min(self.top, len(self.items) - self.shown_rows))
+        self.configure(height=max(self.height, 1))
+        while len(self.rows) < self.shown_rows:
+            self.rows.append(self.row_class(self, self.app))
+
+        targets = [self.items[self.top + slot] if self.top + slot < len(self.items) else None
+                   for slot in range(len(self.rows))]
+        # Release first, so a channel moving to another slot is not unbound by its old row
+        for row, item in zip(self.rows, targets):
+            if row.item is not item:
+                row.unbind_item()
+        for slot, (row, item) in enumerate(zip(self.rows, targets)):
+            if item is None:
+                row.place_forget()
+                continue
+            row.bind_item(item)
+            row.place(x=10, y=slot * self.row_class.HEIGHT)
+
+        if len(self.items) > self.visible_rows:
+            self.scrollbar.configure(height=self.height)
+            self.scrollbar.place(x=791, y=0)
+            self.scrollbar.set(self.top / len(self.items), (self.top + self.shown_rows) / len(self.items))
+        else:
+            self.scrollbar.place_forget()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(round(float(amount) * len(self.items))))
+        elif unit == 'pages':
+            self.scroll_to(self.top + int(amount) * self.shown_rows)
+        else:
+            self.scroll_to(self.top + int(amount))
+
+    def on_mouse_wheel(self, event):
+        # Wheel events are bound application-wide: only react over the rows of this list
+        widget = str(event.widget)
+        if not widget.startswith(str(self) + '.') or widget.startswith(str(self.scrollbar)):
+            return
+        if event.num == 4 or getattr(event, 'delta', 0) > 0:
+            step = -1
+        else:
+            step = 1
+        self.scroll_to(self.top + step * (3 if self.row_class.HEIGHT < ChannelRow.HEIGHT else 1))
+
+class AlimentationTool(ctk.CTk):
+    CONNECTED_GROUP = "All connected channels"  # Built-in group listed before the [groups] section
+    FUTURE_POLL_INTERVAL = 20  # Milliseconds between two checks of a queued operation
+    LIST_Y = 285  # Top of the device list, below the log box, the buttons and the list header
+
+    def __init__(self, startup_timings=None):
+        init_started = time.perf_counter()
+        super().__init__()
+
+        # Seconds spent in each startup phase, completed as the phases finish
+        self.startup_timings = dict(startup_timings or {})
+        self.startup_lock = threading.Lock()
+        self.startup_reported = False
+
+        self.channels = []  # ChannelController of every listed channel, in display order
+        self.channel_index = {}  # (resource, channel) -> ChannelController
+        self.identified_devices = []
+        self.device_names = DeviceNameResolver()
+        self.controller = AlimentationController()
+        self.measurement_engine = MeasurementEngine()
+        config = load_config()
+        self.default_rate = config.getfloat('measurement', 'default_rate_hz', fallback=1.0)
+        self.max_rate = config.getfloat('measurement', 'max_rate_hz', fallback=20.0)
+        self.measurement_store = MeasurementStore(
+            config.getint('measurement', 'history_size', fallback=200000))
+        self.chart_fps = config.getfloat('measurement', 'chart_fps', fallback=10.0)
+        self.visible_channels = config.getint('display', 'visible_channels', fallback=3)
+        self.compact_visible_channels = config.getint('display', 'compact_visible_channels', fallback=15)
+        compact = config.get('display', 'list_mode', fallback='full').strip().lower() == 'compact'
+        # Channel labels are redrawn at most refresh_fps times per second
+        self.refresher = RefreshScheduler(self, config.getfloat('display', 'refresh_fps', fallback=30.0))
+        self.resync_interval = config.getfloat('state', 'resync_interval_s', fallback=0.0)
+        self.resyncing = set()  # Devices with a state resync queued
+        self.charts = {}
+        self.diagnostics_window = None
+        self.group_window = None
+        self.group_results = queue.Queue()
+        self.group_busy = False
+        self.sequences = {}  # Running SequenceRunner per (device, channel)
+        self.sequence_windows = {}
+        self.sequence_events = queue.Queue()
+        self.sequence_polling = False
+        self.recorder = None
+
+        # Log messages are queued and written to the textbox in batches
+        self.log_queue = queue.Queue()
+        self.log_max_lines = max(config.getint('logging', 'max_lines', fallback=2000), 1)
+        self.log_flush_interval = max(config.getint('logging', 'flush_interval_ms', fallback=100), 10)
+        self.log_file = None
+        log_path = config.get('logging', 'file', fallback='').strip()
+        if log_path:
+            if not os.path.isabs(log_path):
+                log_path = os.path.join(os.path.dirname(CONFIG_PATH), log_path)
+            self.log_file = LogFileSink(
+                log_path,
+                int(config.getfloat('logging', 'max_size_mb', fallback=10) * 1024 * 1024),
+                config.getint('logging', 'backup_count', fallback=5)
+            )
+        self.scan_id = 0
+        self.scan_queue = None
+        self.scan_device_index = 0
+        self.scan_started = None
+        self.pending_verification = {}
+        self.offline_devices = set()
+        self.scanning = False
+        self.unidentified_devices = set()  # Resources listed by VISA that did not answer *IDN?
+        self.rescan_counts = None
+        self.rescan_interval = config.getfloat('discovery', 'rescan_interval_s', fallback=0.0)
+        
+        # Configure window with initial size (just enough for log + buttons)
+        self.title("Alimentation Tool")
+        icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "Garrett.ico")
+        self.iconbitmap(icon_path)
+        self.initial_height = 270  # Height for log box + buttons + padding
+        self.geometry(f"800x{self.initial_height}")
+        self.resizable(False, False)
+        self.protocol("WM_DELETE_WINDOW", self.on_closing)
+        
+        # Load Garrett theme depending on system
+        theme_started = time.perf_counter()
+        ctk.set_appearance_mode("system")
+        theme_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "Garrett.json")
+        ctk.set_default_color_theme(theme_path)
+        self.startup_timings['theme'] = time.perf_counter() - theme_started
+
+        # Create log text box first (moved to top)
+        self.log_textbox = ctk.CTkTextbox(
+            self,
+            width=780,
+            height=200,
+            state="disabled"
+        )
+        self.log_textbox.place(x=10, y=10)  # Moved to top position
+
+        # Create search button (adjusted Y position)
+        self.search_button = ctk.CTkButton(
+            self,
+            text="Search Devices",
+            command=self.search_devices,
+            width=100,
+            height=30
+        )
+        self.search_button.place(x=10, y=220)  # Adjusted Y position
+
+        # Create clear button
+        self.clear_button = ctk.CTkButton(
+            self,
+            text="Clear Device List",
+            command=self.clear_devices,
+            state="disabled",
+            width=100,
+            height=30
+        )
+        self.clear_button.place(x=120, y=220)  # Place between Search and Exit
+
+        # Create pause button for continuous monitoring
+        self.pause_button = ctk.CTkButton(
+            self,
+            text="Pause Monitoring",
+            command=self.toggle_pause,
+            width=120,
+            height=30
+        )
+        self.pause_button.place(x=230, y=220)
+
+        # Create record switch to stream samples to disk
+        self.record_switch = ctk.CTkSwitch(
+            self,
+            text="Record",
+            command=self.toggle_recording,
+            width=90,
+            height=30
+        )
+        self.record_switch.place(x=360, y=220)
+
+        # Create groups button for synchronized actions on several channels
+        self.groups_button = ctk.CTkButton(
+            self,
+            text="Groups",
+            command=self.open_groups,
+            width=100,
+            height=30
+        )
+        self.groups_button.place(x=470, y=220)
+
+        # Create diagnostics button showing the command statistics
+        self.diagnostics_button = ctk.CTkButton(
+            self,
+            text="Diagnostics",
+            command=self.open_diagnostics,
+            width=100,
+            height=30
+        )
+        self.diagnostics_button.place(x=580, y=220)
+
+        # Create exit button (adjusted Y position)
+        self.exit_button = ctk.CTkButton(
+            self,
+            text="Exit",
+            command=self.on_closing,
+            width=100,
+            height=30
+        )
+        self.exit_button.place(x=690, y=220)  # Adjusted Y position
+
+        # Header of the device list: channel count, compact table switch and its column titles
+        self.list_header = ctk.CTkFrame(self, width=780, height=28, fg_color="transparent")
+        self.list_count_label = ctk.CTkLabel(self.list_header, text="", width=150, height=28, anchor="w")
+        self.compact_switch = ctk.CTkSwitch(self.list_header, text="Compact", command=self.toggle_compact,
+                                            width=90, height=28)
+        self.compact_switch.place(x=690, y=0)
+        self.column_labels = [(ctk.CTkLabel(self.list_header, text=title, width=60, height=28, anchor="w"), x)
+                              for title, x in CompactChannelRow.COLUMNS]
+
+        # Only the visible channels have widgets, recycled as the list scrolls
+        if compact:
+            self.compact_switch.select()
+            self.device_list = DeviceList(self, self.channels, self.compact_visible_channels,
+                                          CompactChannelRow)
+        else:
+            self.device_list = DeviceList(self, self.channels, self.visible_channels)
+        self.show_list_header()
+
+        # Close pooled sessions that stay unused
+        self.after(60000, self.evict_idle_sessions)
+
+        # Drain the results of the measurement workers
+        self.after(50, self.process_measurements)
+
+        # Show queued log messages
+        self.after(self.log_flush_interval, self.flush_log)
+
+        # Detect supplies plugged in or removed while the tool runs
+        if self.rescan_interval > 0:
+            self.after(int(self.rescan_interval * 1000), self.auto_rescan)
+
+        # Read back the settings of listed devices, in case they are changed from the front panel
+        if self.resync_interval > 0:
+            self.after(int(self.resync_interval * 1000), self.resync_devices)
+
+        # Let automation clients share the sessions and locks of this window
+        self.control_server = None
+        try:
+            self.control_server = ControlServer.from_config(self.controller, log=self.log_message)
+        except OSError as e:
+            self.log_message(f"Control server not started: {str(e)}")
+        if self.control_server is not None:
+            self.control_server.start()
+
+        self.startup_timings['window'] = (time.perf_counter() - init_started
+                                          - self.startup_timings['theme'])
+
+        # Load the VISA backend while the window is already usable
+        threading.Thread(target=self.warm_up_visa, name="visa warm-up", daemon=True).start()
+        self.after(0, self.report_window_ready)
+
+        # Show the devices remembered from the last session once the window is up
+        self.after(0, self.show_cached_devices)
+
+    def warm_up_visa(self):
+        """Create the VISA ResourceManager in the background so the first scan does not wait for it"""
+        started = time.perf_counter()
+        try:
+            backend = PowerSupply.warm_up()
+        except Exception as e:
+            self.log_message(f"VISA initialization failed: {str(e)}")
+            return
+        self.record_startup_phase('rm_init', time.perf_counter() - started)
+        self.log_message(f"VISA ready in {self.startup_timings['rm_init'] * 1000:.0f} ms ({backend})")
+
+    def report_window_ready(self):
+        timings = self.startup_timings
+        phases = ", ".join(f"{name} {timings[name] * 1000:.0f} ms"
+                           for name in ('imports', 'theme', 'window') if name in timings)
+        self.log_message(f"Window ready ({phases})")
+
+    def record_startup_phase(self, name, seconds):
+        """Store the duration of a startup phase, and log them all once the last one is known"""
+        with self.startup_lock:
+            if name in self.startup_timings:
+                return
+            self.startup_timings[name] = seconds
+            if self.startup_reported or not {'rm_init', 'first_scan'} <= set(self.startup_timings):
+                return
+            self.startup_reported = True
+
+        # Machine readable, to compare startup times between releases
+        timings = {name: round(seconds * 1000, 1) for name, seconds in self.startup_timings.items()}
+        self.log_message(f"Startup timings (ms): {json.dumps(timings)}")
+
+    def search_devices(self, cached_devices=()):
+        # Clear existing devices if any
+        self.channels.clear()
+        self.channel_index.clear()
+        self.identified_devices.clear()
+        self.offline_devices.clear()
+        self.device_list.clear()
+        self.fit_device_list()
+
+        # Results are handed from the discovery thread to the Tk thread through a queue
+        self.scan_id += 1
+        self.scan_queue = queue.Queue()
+        self.scan_device_index = 0
+        self.scan_started = time.perf_counter()
+        self.scanning = True
+        self.unidentified_devices = set()
+        self.search_button.configure(state="disabled")
+
+        # Draw remembered devices right away; the scan below confirms or retires them
+        self.pending_verification = {}
+        for device, info in cached_devices:
+            self.pending_verification[device] = (info, self.add_identified_device(device, info, verified=False))
+
+        if cached_devices:
+            self.log_message(f"Cached devices: {len(self.identified_devices)}, verifying...")
+        else:
+            self.log_message("Searching devices...")
+
+        threading.Thread(
+            target=self.run_discovery,
+            args=(self.scan_id, self.scan_queue),
+            daemon=True
+        ).start()
+        self.after(50, self.process_discovery_results, self.scan_id)
+
+    def show_cached_devices(self):
+        """Show the devices found by previous sessions, then verify them in the background"""
+        cached_devices = PowerSupply.cached_devices()
+        if cached_devices:
+            self.search_devices(cached_devices)
+
+    def run_discovery(self, scan_id, results):
+        """Discovery worker: forward every *IDN? answer to the GUI as soon as it arrives"""
+        try:
+            for device, info in PowerSupply.iter_available_devices():
+                results.put(('device', device, info))
+        except Exception as e:
+            results.put(('error', str(e), None))
+        results.put(('done', None, None))
+
+    def process_discovery_results(self, scan_id):
+        """Draw the frames of the devices identified since the last poll"""
+        # Ignore results from a scan that has been superseded or cleared
+        if scan_id != self.scan_id:
+            return
+
+        try:
+            while True:
+                kind, device, info = self.scan_queue.get_nowait()
+
+                if kind == 'device':
+                    if device in self.pending_verification:
+                        cached_info, frames = self.pending_verification.pop(device)
+                        if info == cached_info:
+                            for controls, channel, device_index in frames:
+                                self.channel_ready(controls, device, info, channel, device_index)
+                            self.refresh_device_state(device, frames)
+                            continue
+                        if info == "Unable to identify":
+                            # Still listed but silent, e.g. powered off: rescans bring it back in place
+                            self.mark_device_offline(device, cached_info, frames)
+                            continue
+                        # Something else answers at this address now: its channels replace the cached ones
+                        self.log_message(f"Cached device replaced: {cached_info} at {device}")
+                        self.remove_device_channels(device)
+                    if info != "Unable to identify":
+                        self.add_identified_device(device, info)
+                    else:
+                        self.unidentified_devices.add(device)
+                    continue
+
+                if kind == 'error':
+                    self.log_message(f"Error searching devices: {device}")
+                    continue
+
+                self.record_startup_phase('first_scan', time.perf_counter() - self.scan_started)
+                self.scanning = False
+
+                # Discovery finished: cached devices that were not listed are gone
+                for device, (cached_info, frames) in list(self.pending_verification.items()):
+                    self.mark_device_offline(device, cached_info, frames)
+                self.pending_verification = {}
+
+                if not self.identified_devices:
+                    # Reset window to initial size
+                    self.fit_device_list()
+                    self.log_message("No identifiable devices found")
+                    self.search_button.configure(state="normal")
+                    return
+
+                found = [entry for entry in self.identified_devices if entry[0] not in self.offline_devices]
+                self.log_message(f"Devices found: {len(found)}")
+
+                # Enable clear button
+                self.clear_button.configure(state="normal")
+
+                # From now on the search button only probes what changed
+                self.search_button.configure(text="Rescan", command=self.rescan_devices, state="normal")
+                return
+        except queue.Empty:
+            pass
+
+        self.after(50, self.process_discovery_results, scan_id)
+
+    def add_identified_device(self, device, info, verified=True):
+        """Create the frame(s) of an identified device, splitting dual channel devices"""
+        self.scan_device_index += 1  # Increment device index for each physical device
+        device_index = self.scan_device_index
+
+        # Multi channel devices get one entry per channel, all with the same device_index
+        frames = []
+        for channel in AlimentationController.channels_of(info):
+            frame_index = len(self.identified_devices)
+            self.identified_devices.append((device, info, channel, device_index))
+
+            controls = self.add_channel_controller(device, info, frame_index, channel, device_index)
+            frames.append((controls, channel, device_index))
+
+            if verified:
+                self.channel_ready(controls, device, info, channel, device_index)
+            else:
+                # Cached entry: keep it inert until the device has answered again
+                controls.configure('connection_status', text="Verifying", text_color="orange")
+                controls.configure('connect_button', state="disabled")
+
+        # The list grows until visible_channels, then scrolls
+        self.fit_device_list()
+        if verified:
+            self.refresh_device_state(device, frames)
+        return frames
+
+    def channel_ready(self, controls, device, info, channel, device_index):
+        """Enable the frame of an identified channel; its power status comes from refresh_device_state"""
+        controls.configure('connection_status', text="Disconnected", text_color="red")
+        controls.configure('connect_button', state="normal")
+
+        # Log appropriate message based on device type
+        if channel:
+            self.log_message(f"{device_index} - {info} (Channel {channel}) at {device}")
+        else:
+            self.log_message(f"{device_index} - {info} at {device}")
+
+    def show_power_status(self, controls, output_on):
+        if output_on:
+            controls.configure('power_status', text="Power ON", text_color="green")
+            controls.configure('power_on_button', state="disabled")
+            controls.configure('power_off_button', state="normal")
+        else:
+            controls.configure('power_status', text="Power OFF", text_color="red")
+            controls.configure('power_on_button', state="normal")
+            controls.configure('power_off_button', state="disabled")
+
+    def refresh_device_state(self, device, frames):
+        """Read back the settings of all channels of a device in one batch and show their power status"""
+        if device in self.resyncing:
+            return
+        self.resyncing.add(device)
+        channels = [channel for controls, channel, device_index in frames]
+
+        def resynced(states, error):
+            self.resyncing.discard(device)
+            if error is not None:
+                self.log_message(f"Could not check power status: {str(error)}")
+                return
+            for controls, channel, device_index in frames:
+                # Frames destroyed by a clear in the meantime are no longer listed
+                if self.channel_index.get(controls.key) is controls and channel in states:
+                    self.show_power_status(controls, states[channel]['output'])
+
+        self.when_done(self.controller.submit(device, lambda: self.controller.resync(device, channels)),
+                       resynced)
+
+    def resync_devices(self):
+        """Periodically refresh the state cache and power status of the listed devices"""
+        frames = {}
+        for controls in self.channels:
+            device = controls.device
+            if device in self.offline_devices or device in self.pending_verification:
+                continue
+            frames.setdefault(device, []).append((controls, controls.channel, None))
+        for device, channel_frames in frames.items():
+            self.refresh_device_state(device, channel_frames)
+        self.after(int(self.resync_interval * 1000), self.resync_devices)
+
+    def mark_device_offline(self, device, info, frames, message="Cached device not found"):
+        """Flag the channels of a device that is gone, keeping them listed with their history"""
+        self.offline_devices.add(device)
+        for controls, channel, device_index in frames:
+            self.measurement_engine.stop_channel(device, channel)
+            self.stop_sequence(device, channel)
+            self.show_disconnected(controls)
+            controls.configure('connection_status', text="Offline", text_color="red")
+            controls.configure('connect_button', state="disabled")
+            # The limits may not survive a power cycle: they have to be set again
+            controls.protections = {'ovp': False, 'ocp': False}
+            controls.configure('ovp_status', text="Set OVP", text_color="red")
+            controls.configure('ocp_status', text="Set OCP", text_color="red")
+        self.log_message(f"{message}: {info} at {device}")
+
+    def frames_of(self, device):
+        """(controls, channel, device_index) of the listed channels of a device"""
+        return [(controls, controls.channel, controls.device_index)
+                for controls in self.channels if controls.device == device]
+
+    def rescan_devices(self, automatic=False):
+        """Probe only the resources that appeared, and flag the ones that disappeared
+
+        Listed channels are updated in place, so connected channels keep their
+        state. Resources that did not answer before are only probed again by a
+        manual rescan.
+        """
+        if self.scanning:
+            return
+        self.scanning = True
+        self.scan_id += 1
+        self.scan_queue = queue.Queue()
+        self.rescan_counts = {'new': 0, 'back': 0, 'gone': 0}
+        self.search_button.configure(state="disabled")
+
+        online = {controls.device for controls in self.channels if controls.device not in self.offline_devices}
+        skipped = set(self.unidentified_devices) if automatic else set()
+        threading.Thread(
+            target=self.run_rescan,
+            args=(self.scan_queue, online, skipped),
+            name="rescan",
+            daemon=True
+        ).start()
+        self.after(50, self.process_rescan_results, self.scan_id, automatic)
+
+    def run_rescan(self, results, online, skipped):
+        """Rescan worker: list the resources, then probe those not already listed and online"""
+        try:
+            present = PowerSupply.list_resources()
+            results.put(('present', present, None))
+            new = [device for device in present if device not in online and device not in skipped]
+            for device, info in PowerSupply.iter_available_devices(new):
+                results.put(('device', device, info))
+        except Exception as e:
+            results.put(('error', str(e), None))
+        results.put(('done', None, None))
+
+    def process_rescan_results(self, scan_id, automatic):
+        # Ignore results from a rescan that has been superseded or cleared
+        if scan_id != self.scan_id:
+            return
+
+        try:
+            while True:
+                kind, device, info = self.scan_queue.get_nowait()
+
+                if kind == 'present':
+                    present = set(device)
+                    for listed in list(dict.fromkeys(controls.device for controls in self.channels)):
+                        if listed not in present and listed not in self.offline_devices:
+                            frames = self.frames_of(listed)
+                            self.mark_device_offline(listed, frames[0][0].info, frames, "Device disconnected")
+                            self.controller.submit(listed, lambda d=listed: self.controller.forget_device(d))
+                            self.rescan_counts['gone'] += 1
+                    self.unidentified_devices &= present
+                    continue
+
+                if kind == 'device':
+                    self.add_rescanned_device(device, info)
+                    continue
+
+                if kind == 'error':
+                    self.log_message(f"Error rescanning devices: {device}")
+                    continue
+
+                self.scanning = False
+                self.search_button.configure(state="normal")
+                counts = self.rescan_counts
+                if counts['new'] or counts['back'] or counts['gone'] or not automatic:
+                    self.log_message(f"Rescan: {counts['new']} new, {counts['back']} back online, "
+                                     f"{counts['gone']} disconnected")
+                return
+        except queue.Empty:
+            pass
+
+        self.after(50, self.process_rescan_results, scan_id, automatic)
+
+    def add_rescanned_device(self, device, info):
+        if info == "Unable to identify":
+            # Listed devices stay offline and keep being probed by the automatic rescans
+            if not self.frames_of(device):
+                self.unidentified_devices.add(device)
+            return
+        self.unidentified_devices.discard(device)
+
+        frames = self.frames_of(device)
+        if frames and frames[0][0].info == info:
+            # The same device is back: reuse its channels and their history
+            self.offline_devices.discard(device)
+            for controls, channel, device_index in frames:
+                self.channel_ready(controls, device, info, channel, device_index)
+            self.refresh_device_state(device, frames)
+            self.rescan_counts['back'] += 1
+            return
+
+        if frames:
+            # Another model answers at this address now: its channels replace the old ones
+            self.remove_device_channels(device)
+        self.add_identified_device(device, info)
+        self.rescan_counts['new'] += 1
+
+    def remove_device_channels(self, device):
+        for controls in [controls for controls in self.channels if controls.device == device]:
+            self.close_chart(controls.key)
+            self.channels.remove(controls)
+            if self.channel_index.get(controls.key) is controls:
+                del self.channel_index[controls.key]
+        self.identified_devices[:] = [entry for entry in self.identified_devices if entry[0] != device]
+        self.offline_devices.discard(device)
+        self.fit_device_list()
+
+    def auto_rescan(self):
+        """Timer of the hot-plug detection: rescan while devices are listed and nothing else is scanning"""
+        if self.channels and not self.scanning:
+            self.rescan_devices(automatic=True)
+        self.after(int(self.rescan_interval * 1000), self.auto_rescan)
+
+    def clear_devices(self):
+        """Clear all devices from the list and reset window size"""
+        self.release_all_devices()
+            
+        # Close the charts of the listed channels
+        for key in list(self.charts):
+            self.close_chart(key)
+
+        # Clear existing devices
+        self.channels.clear()
+        self.channel_index.clear()
+        self.identified_devices.clear()
+        self.offline_devices.clear()
+        self.device_list.clear()
+
+        # Reset window to initial size
+        self.fit_device_list()
+        self.log_message("Device list cleared")
+
+        # Reset search button state
+        self.scan_id += 1  # Results of a rescan still running are ignored
+        self.scanning = False
+        self.search_button.configure(text="Search Devices", command=self.search_devices, state="normal")
+        self.clear_button.configure(state="disabled")
+
+    def release_all_devices(self):
+        """Unlock every listed channel and release the sessions held by connected ones"""
+        for controls in self.channels:
+            device = controls.device
+            channel = controls.channel
+            info = controls.info
+
+            self.measurement_engine.stop_channel(device, channel)
+            self.stop_sequence(device, channel)
+
+            # Nothing to unlock on devices that never answered, nor on channels of automation clients
+            if device in self.offline_devices or self.client_owned(device, channel):
+                continue
+            
+            # Queued behind any pending operation of the device, so a late connect is undone too
+            def disconnected(result, error, device=device, info=info, channel=channel):
+                if error is not None:
+                    self.log_message(f"Error disconnecting device: {str(error)}")
+                else:
+                    self.log_message("Disconnected device", device, info, channel)
+            future = self.controller.submit(device, lambda d=device, c=channel: self.controller.disconnect(d, c))
+            self.when_done(future, disconnected)
+
+    def evict_idle_sessions(self):
+        """Periodically close pooled sessions nobody has used for a while"""
+        PowerSupply.evict_idle()
+        self.after(60000, self.evict_idle_sessions)
+
+    def add_channel_controller(self, device, info, frame_index, channel=None, device_index=None):
+        """Add a channel to the device list; its widgets only exist while a row shows it"""
+        # Use device_index for display if provided, otherwise use frame_index+1
+        display_index = device_index if device_index is not None else frame_index + 1
+        
+        # Device name with channel if applicable
+        if channel:
+            formatted_name = f"Alimentation {display_index}: {self.get_formatted_device_name(info)} Channel {channel}"
+            short_name = f"{display_index}: {self.get_formatted_device_name(info)} CH{channel}"
+        else:
+            formatted_name = f"Alimentation {display_index}: {self.get_formatted_device_name(info)}"
+            short_name = f"{display_index}: {self.get_formatted_device_name(info)}"
+
+        controls = ChannelController(device, info, channel, device_index, formatted_name, short_name,
+                                     self.refresher)
+        self.channels.append(controls)
+        self.channel_index[controls.key] = controls
+        return controls
+
+    def show_list_header(self):
+        """Show the header of the device list, with the column titles in compact mode"""
+        if not self.channels:
+            self.list_header.place_forget()
+            return
+        count = len(self.channels)
+        self.list_count_label.configure(text=f"{count} channel{'s' if count != 1 else ''}")
+        if self.compact_switch.get():
+            self.list_count_label.place_forget()
+            for label, x in self.column_labels:
+                label.place(x=x, y=0)
+        else:
+            for label, x in self.column_labels:
+                label.place_forget()
+            self.list_count_label.place(x=10, y=0)
+        self.list_header.place(x=10, y=self.LIST_Y - 30)
+
+    def fit_device_list(self):
+        """Size the window to the visible part of the device list"""
+        self.device_list.refresh()
+        self.show_list_header()
+        if not self.channels:
+            self.device_list.place_forget()
+            self.geometry(f"800x{self.initial_height}")
+            return
+        self.device_list.place(x=0, y=self.LIST_Y)
+        self.geometry(f"800x{self.LIST_Y + self.device_list.height + 5}")
+
+    def toggle_compact(self):
+        """Switch the device list between full panels and one line per channel"""
+        if self.compact_switch.get():
+            self.device_list.set_mode(CompactChannelRow, self.compact_visible_channels)
+        else:
+            self.device_list.set_mode(ChannelRow, self.visible_channels)
+        self.fit_device_list()
+
+    def show_channel_details(self, controls):
+        """Leave the compact list for the full panel of a channel"""
+        if controls is None:
+            return
+        self.compact_switch.deselect()
+        self.toggle_compact()
+        self.device_list.show_item(controls)
+
+    def get_formatted_device_name(self, info):
+        """Format the device name based on the model using configuration file"""
+        return self.device_names.resolve(info)
+
+    def log_message(self, message, device=None, info=None, channel=None):
+        """Queue a message for the log textbox with device information if provided
+
+        Safe to call from any thread: the textbox itself is only updated by flush_log.
+        """
+        timestamp = time.time()
+        
+        # Format the message with device info if provided
+        if device and info:
+            device_name = self.get_formatted_device_name(info)
+            if channel:
+                formatted_message = f"Alimentation: {device_name} Channel {channel} - {message}"
+            else:
+                formatted_message = f"Alimentation: {device_name} - {message}"
+        else:
+            formatted_message = message
+
+        self.log_queue.put((timestamp, formatted_message))
+        if self.log_file is not None:
+            self.log_file.write(formatted_message)
+
+    def flush_log(self):
+        """Append the queued messages to the textbox in one go, keeping at most log_max_lines"""
+        lines = []
+        try:
+            while True:
+                timestamp, formatted_message = self.log_queue.get_nowait()
+                # Get date and time of the message in the specified format
+                current_time = time.strftime("[%d/%m/%y | %H:%M]", time.localtime(timestamp))
+                lines.append(f"{current_time}   {formatted_message}\n")
+        except queue.Empty:
+            pass
+
+        if lines:
+            self.log_textbox.configure(state="normal")
+            self.log_textbox.insert("end", ''.join(lines))
+
+            # Trim the oldest lines so the widget does not grow forever
+            line_count = int(self.log_textbox.index("end-1c").split('.')[0]) - 1
+            if line_count > self.log_max_lines:
+                self.log_textbox.delete("1.0", f"{line_count - self.log_max_lines + 1}.0")
+
+            self.log_textbox.configure(state="disabled")
+            self.log_textbox.see("end")
+
+        self.after(self.log_flush_interval, self.flush_log)
+
+    def on_closing(self):
+        if self.control_server is not None:
+            self.control_server.stop()
+        self.measurement_engine.stop()
+        for runner in list(self.sequences.values()):
+            runner.stop()
+            runner.join(timeout=1.0)
+        self.stop_recording(timeout=5.0)
+        self.release_all_devices()
+
+        # Close every pooled session, including those still referenced
+        self.controller.close()
+
+        if self.log_file is not None:
+            self.log_file.close()
+        
+        # Destroy the window
+        self.destroy()
+
+    def when_done(self, future, callback):
+        """Call callback(result, error) from the Tk thread once a queued operation has finished"""
+        if not future.done():
+            self.after(self.FUTURE_POLL_INTERVAL, self.when_done, future, callback)
+            return
+        try:
+            result, error = future.result(), None
+        except Exception as e:
+            result, error = None, e
+        callback(result, error)
+
+    def connect_device(self, device, info, channel=None):
+        """Connect to the selected power supply"""
+        # Find the device frame to update status
+        controls = self.channel_index[(device, channel)]
+
+        # Disable connect button while connected, or while the connection is queued
+        controls.configure('connect_button', state="disabled")
+
+        def connected(result, error):
+            if error is not None:
+                self.log_message(f"Error connecting to device: {str(error)}")
+                controls.configure('connect_button', state="normal")
+                return
+
+            self.log_message("Connected", device, info, channel)
+                
+            # Update connection status
+            controls.configure('connection_status', text="Connected", text_color="Green")
+
+            # Enable all controls
+            controls.configure('disconnect_button', state="normal")
+            controls.configure('overvolt_entry', state="normal")
+            controls.configure('set_overvolt_button', state="normal")
+            controls.configure('overcurr_entry', state="normal")
+            controls.configure('set_overcurr_button', state="normal")
+            controls.configure('measure_button', state="normal")
+            controls.configure('monitor_switch', state="normal")
+            controls.configure('rate_entry', state="normal")
+
+        def connect():
+            # Checked on the command queue, after any connect queued by the control server
+            if self.client_owned(device, channel):
+                raise RuntimeError("the channel is controlled by an automation client")
+            self.controller.connect(device, channel)
+        self.when_done(self.controller.submit(device, connect), connected)
+
+    def client_owned(self, device, channel):
+        """Whether an automation client of the control server has connected a channel"""
+        return self.control_server is not None and self.control_server.owns(device, channel)
+            
+    def disconnect_device(self, device, info, channel=None):
+        """Disconnect from the selected power supply"""
+        # Find the device frame to update status
+        controls = self.channel_index[(device, channel)]
+
+        self.measurement_engine.stop_channel(device, channel)
+        self.stop_sequence(device, channel)
+
+        def disconnected(result, error):
+            if error is not None:
+                self.log_message(f"Error disconnecting from device: {str(error)}")
+                return
+
+            self.log_message("Disconnected", device, info, channel)
+            self.show_disconnected(controls)
+
+        self.when_done(self.controller.submit(device, lambda: self.controller.disconnect(device, channel)),
+                       disconnected)
+
+    def show_disconnected(self, controls):
+        # Update connection status
+        controls.configure('connection_status', text="Disconnected", text_color="red")
+
+        # Disable all controls except connect button
+        controls.configure('disconnect_button', state="disabled")
+        controls.configure('power_on_button', state="disabled")
+        controls.configure('power_off_button', state="disabled")
+        controls.configure('voltage_entry', state="disabled")
+        controls.configure('set_voltage_button', state="disabled")
+        controls.configure('overvolt_entry', state="disabled")
+        controls.configure('set_overvolt_button', state="disabled")
+        controls.configure('overcurr_entry', state="disabled")
+        controls.configure('set_overcurr_button', state="disabled")
+        controls.configure('measure_button', state="disabled")
+        controls.configure('monitor_switch', selected=False)
+        controls.configure('monitor_switch', state="disabled")
+        controls.configure('rate_entry', state="disabled")
+
+        # Re-enable connect button
+        controls.configure('connect_button', state="normal")
+
+    def set_voltage(self, device, voltage_entry, info, channel=None):
+        """Set the voltage for the power supply"""
+        voltage = voltage_entry.get()
+        if not voltage:
+            self.log_message("Please enter a voltage value", device, info, channel)
+            return
+            
+        try:
+            voltage_value = float(voltage)
+        except ValueError:
+            self.log_message("Invalid voltage value", device, info, channel)
+            return
+
+        def done(result, error):
+            if error is not None:
+                self.log_message(f"Error setting voltage: {str(error)}")
+            elif result == voltage_value:
+                # A click replaced by a newer one before being sent stays silent
+                self.log_message(f"Voltage set to {voltage_value}V", device, info, channel)
+
+        self.when_done(self.controller.queue_setpoint(device, 'voltage', voltage_value, channel), done)
+
+    def set_overvoltage(self, device, entry, info, channel=None):
+        """Set over voltage protection"""
+        overvolt = entry.get()
+        if not overvolt:
+            self.log_message("Please enter an overvoltage value", device, info, channel)
+            return
+            
+        try:
+            overvolt_value = float(overvolt)
+        except ValueError:
+            self.log_message("Invalid overvoltage value", device, info, channel)
+            return
+
+        def done(result, error):
+            if error is not None:
+                self.log_message(f"Failed to set OVP: {str(error)}", device, info, channel)
+            elif result == overvolt_value:
+                self.log_message(f"Overvoltage protection set to {overvolt_value}V", device, info, channel)
+                self.protection_set(device, info, channel, "ovp")
+
+        self.when_done(self.controller.queue_setpoint(device, 'overvoltage', overvolt_value, channel), done)
+
+    def set_overcurrent(self, device, entry, info, channel=None):
+        """Set over current protection"""
+        overcurr = entry.get()
+        if not overcurr:
+            self.log_message("Please enter an overcurrent value", device, info, channel)
+            return
+            
+        try:
+            overcurr_value = float(overcurr)
+        except ValueError:
+            self.log_message("Invalid overcurrent value", device, info, channel)
+            return
+
+        def done(result, error):
+            if error is not None:
+                self.log_message(f"Failed to set OCP: {str(error)}", device, info, channel)
+            elif result == overcurr_value:
+                self.log_message(f"Overcurrent protection set to {overcurr_value}A", device, info, channel)
+                self.protection_set(device, info, channel, "ocp")
+
+        self.when_done(self.controller.queue_setpoint(device, 'overcurrent', overcurr_value, channel), done)
+
+    def protection_set(self, device, info, channel, protection):
+        """Record an 'ovp' or 'ocp' limit and enable the voltage controls once both are set"""
+        controls = self.channel_index.get((device, channel))
+        if controls is None:
+            # The list was cleared while the setpoint was queued
+            return
+        controls.protections[protection] = True
+        controls.configure(f'{protection}_status', text=f"{protection.upper()} Set", text_color="green")
+
+        # Check if both protections are set
+        if controls.protections_set:
+            # Enable voltage controls
+            controls.configure('voltage_entry', state="normal")
+            controls.configure('set_voltage_button', state="normal")
+            
+            self.log_message("Protection limits set. Voltage control enabled.", device, info, channel) 
+
+    def power_on(self, device, info, channel=None):
+        """Turn on the power supply output"""
+        self.switch_output(device, info, channel, True)
+    
+    def power_off(self, device, info, channel=None):
+        """Turn off the power supply output"""
+        self.switch_output(device, info, channel, False)
+
+    def switch_output(self, device, info, channel, on):
+        # Find the device frame to update status
+        controls = self.channel_index[(device, channel)]
+        state = "ON" if on else "OFF"
+
+        def switched(result, error):
+            if error is not None:
+                self.log_message(f"Error turning power {state.lower()}: {str(error)}")
+                return
+
+            self.log_message(f"Power output turned {state}", device, info, channel)
+                
+            # Update power status indicator
+            self.show_power_status(controls, on)
+
+        self.when_done(self.controller.submit(device, lambda: self.controller.set_output(device, on, channel)),
+                       switched)
+
+    def measure_values(self, device, info, channel=None):
+        """Measure and display voltage, current and power values"""
+        # Find the device frame to update measurements
+        controls = self.channel_index[(device, channel)]
+
+        def measured(result, error):
+            if error is not None:
+                self.log_message(f"Error measuring values: {str(error)}")
+                return
+            voltage, current, power = result
+
+            # Update measurement labels
+            timestamp = time.time()
+            self.measurement_store.append(device, channel, timestamp, (voltage, current, power))
+            if self.recorder is not None:
+                self.recorder.record(device, channel, timestamp, (voltage, current, power))
+            self.show_measurement(controls, voltage, current, power)
+            
+            self.log_message(f"Measured: {voltage}, {current}, {power}", device, info, channel)
+
+        self.when_done(self.controller.submit(device, lambda: self.controller.measure(device, channel)),
+                       measured)
+
+    def open_chart(self, device, info, channel=None):
+        """Open the live chart of a channel, or bring it to the front if already open"""
+        chart = self.charts.get((device, channel))
+        if chart is not None and chart.winfo_exists():
+            chart.lift()
+            chart.focus()
+            return
+
+        if channel:
+            title = f"{self.get_formatted_device_name(info)} Channel {channel}"
+        else:
+            title = self.get_formatted_device_name(info)
+        chart = ChannelChart(self, title, self.measurement_store.history(device, channel), self.chart_fps)
+        chart.protocol("WM_DELETE_WINDOW", lambda key=(device, channel): self.close_chart(key))
+        self.charts[(device, channel)] = chart
+
+    def open_diagnostics(self):
+        if self.diagnostics_window is not None and self.diagnostics_window.winfo_exists():
+            self.diagnostics_window.lift()
+            self.diagnostics_window.focus()
+            return
+        self.diagnostics_window = DiagnosticsWindow(self)
+
+    def close_chart(self, key):
+        chart = self.charts.pop(key, None)
+        if chart is not None:
+            chart.destroy()
+
+    def show_measurement(self, controls, voltage, current, power):
+        controls.configure('voltage_measure_label', text=f"Voltage: {voltage}")
+        controls.configure('current_measure_label', text=f"Current: {current}")
+        controls.configure('power_measure_label', text=f"Power: {power}")
+
+    def monitoring_rate(self, text):
+        """Read the sampling rate typed for a channel, falling back to the configured default"""
+        try:
+            rate = float(text)
+        except ValueError:
+            return self.default_rate
+        if rate <= 0:
+            return self.default_rate
+        return min(rate, self.max_rate)
+
+    def toggle_monitoring(self, device, info, channel=None):
+        """Start or stop the continuous measurement of a channel"""
+        controls = self.channel_index[(device, channel)]
+
+        if controls.view['monitor_switch'].get('selected'):
+            rate = self.monitoring_rate(controls.entry_text('rate_entry'))
+            self.measurement_engine.start_channel(device, channel, rate)
+            self.log_message(f"Monitoring started at {rate:g} Hz", device, info, channel)
+        else:
+            self.measurement_engine.stop_channel(device, channel)
+            self.log_message("Monitoring stopped", device, info, channel)
+
+    def update_monitoring_rate(self, device, info, channel=None):
+        """Apply a new rate to a channel that is already monitored"""
+        if not self.measurement_engine.is_monitoring(device, channel):
+            return
+        controls = self.channel_index[(device, channel)]
+        rate = self.monitoring_rate(controls.entry_text('rate_entry'))
+        self.measurement_engine.start_channel(device, channel, rate)
+        self.log_message(f"Monitoring rate set to {rate:g} Hz", device, info, channel)
+
+    def toggle_pause(self):
+        """Pause or resume every monitored channel"""
+        if self.measurement_engine.paused:
+            self.measurement_engine.resume()
+            self.pause_button.configure(text="Pause Monitoring")
+            self.log_message("Monitoring resumed")
+        else:
+            self.measurement_engine.pause()
+            self.pause_button.configure(text="Resume Monitoring")
+            self.log_message("Monitoring paused")
+
+    def open_sequence(self, device, info, channel=None):
+        window = self.sequence_windows.get((device, channel))
+        if window is not None and window.winfo_exists():
+            window.lift()
+            window.focus()
+            return
+
+        if channel:
+            title = f"{self.get_formatted_device_name(info)} Channel {channel}"
+        else:
+            title = self.get_formatted_device_name(info)
+        self.sequence_windows[(device, channel)] = SequenceWindow(self, title, device, info, channel)
+
+    def show_sequence_status(self, device, channel, text):
+        window = self.sequence_windows.get((device, channel))
+        if window is not None and window.winfo_exists():
+            window.show_status(text)
+
+    def start_sequence(self, device, info, channel, profile, mode):
+        """Play a profile on a connected channel whose protections are set"""
+        if not self.controller.is_connected(device, channel):
+            self.show_sequence_status(device, channel, "Connect the channel first")
+            return
+        controls = self.channel_index.get((device, channel))
+        if controls is None or not controls.protections_set:
+            self.show_sequence_status(device, channel, "Set OVP and OCP first")
+            return
+        runner = self.sequences.get((device, channel))
+        if runner is not None and runner.is_alive():
+            self.show_sequence_status(device, channel, "A sequence is already running")
+            return
+
+        # Setpoint writes still queued for the device go out before the first step, not during the profile
+        ready = self.controller.submit(device, lambda: None)
+        runner = SequenceRunner(device, channel, profile, mode, self.sequence_events, ready,
+                                self.controller.state)
+        runner.info = info
+        self.sequences[(device, channel)] = runner
+        runner.start()
+        self.log_message(f"Sequence started: {len(profile.steps)} steps over {profile.duration:g} s",
+                         device, info, channel)
+        self.show_sequence_status(device, channel, "Running")
+        if not self.sequence_polling:
+            self.sequence_polling = True
+            self.after(50, self.process_sequence_events)
+
+    def stop_sequence(self, device, channel=None):
+        runner = self.sequences.get((device, channel))
+        if runner is not None:
+            runner.stop()
+
+    def process_sequence_events(self):
+        """Show the progress of running sequences and log how they ended"""
+        latest = {}
+        try:
+            for _ in range(500):
+                event = self.sequence_events.get_nowait()
+                kind, device, channel = event[:3]
+                runner = self.sequences.get((device, channel))
+                info = runner.info if runner is not None else None
+                if kind == 'step':
+                    latest[(device, channel)] = event
+                    continue
+
+                self.sequences.pop((device, channel), None)
+                latest.pop((device, channel), None)
+                if kind == 'error':
+                    message = f"Sequence failed: {event[3]}"
+                else:
+                    summary = event[3]
+                    timing = "instrument" if summary['mode'] == 'list' else "host"
+                    message = (f"Sequence {'stopped' if summary['aborted'] else 'finished'}: "
+                               f"{summary['steps']} steps, {timing} timed")
+                    if summary['mode'] == 'host':
+                        message += f", max lateness {summary['max_lateness'] * 1000:.1f} ms"
+                self.log_message(message, device, info, channel)
+                self.show_sequence_status(device, channel, message)
+        except queue.Empty:
+            pass
+
+        # Only the last step of each channel is worth drawing
+        for (device, channel), (kind, _, _, index, voltage, lateness) in latest.items():
+            runner = self.sequences.get((device, channel))
+            total = len(runner.profile.steps) if runner is not None else index + 1
+            self.show_sequence_status(device, channel, f"Step {index + 1}/{total}: {voltage:g} V")
+
+        if self.sequences:
+            self.after(50, self.process_sequence_events)
+        else:
+            self.sequence_polling = False
+
+    def open_groups(self):
+        if self.group_window is not None and self.group_window.winfo_exists():
+            self.group_window.lift()
+            self.group_window.focus()
+            return
+        group_names = [self.CONNECTED_GROUP] + list(AlimentationController.channel_groups())
+        self.group_window = GroupWindow(self, group_names)
+
+    def group_targets(self, name):
+        if name == self.CONNECTED_GROUP:
+            return [target for target in self.controller.sessions if not self.client_owned(*target)]
+        return AlimentationController.channel_groups().get(name, [])
+
+    def run_group_action(self, name, action, on=None, **setpoints):
+        """Start a group action on a worker thread; process_group_results reports its outcome"""
+        if self.group_busy:
+            self.log_message("A group action is already running")
+            return
+
+        targets = self.group_targets(name)
+        if not targets:
+            self.log_message(f"Group '{name}' has no channels")
+            return
+        disconnected = [target for target in targets
+                        if not self.controller.is_connected(*target) or self.client_owned(*target)]
+        if disconnected:
+            self.log_message(f"Group '{name}': connect every channel first ({len(disconnected)} not connected)")
+            return
+
+        # Same rule as a single channel: no voltage before both protections are set
+        if setpoints.get('voltage') is not None:
+            for device, channel in targets:
+                controls = self.channel_index.get((device, channel))
+                protections = controls.protections if controls is not None else {}
+                if not ((protections.get("ovp") or 'overvoltage' in setpoints) and
+                        (protections.get("ocp") or 'overcurrent' in setpoints)):
+                    self.log_message(f"Group '{name}': set OVP and OCP on every channel before the voltage")
+                    return
+
+        self.group_busy = True
+        threading.Thread(target=self.run_group_worker, args=(name, action, targets, on, setpoints),
+                         name="group action", daemon=True).start()
+        self.after(50, self.process_group_results)
+
+    def run_group_worker(self, name, action, targets, on, setpoints):
+        try:
+            if action == 'output':
+                result = self.controller.set_group_output(targets, on)
+            else:
+                result = self.controller.apply_group_setpoints(targets, **setpoints)
+        except Exception as e:
+            result = e
+        self.group_results.put((name, action, on, setpoints, result))
+
+    def process_group_results(self):
+        try:
+            name, action, on, setpoints, result = self.group_results.get_nowait()
+        except queue.Empty:
+            self.after(50, self.process_group_results)
+            return
+        self.group_busy = False
+
+        if isinstance(result, Exception):
+            self.log_message(f"Group '{name}': {str(result)}")
+            self.show_group_status(str(result))
+            return
+
+        for device, error in result.errors.items():
+            self.log_message(f"Group '{name}': error on {device}: {error}")
+
+        for device, channel in result.completed:
+            controls = self.channel_index.get((device, channel))
+            if controls is None:
+                continue
+            if action == 'output':
+                self.show_power_status(controls, on)
+                continue
+
+            if 'overvoltage' in setpoints:
+                controls.protections["ovp"] = True
+                controls.configure('ovp_status', text="OVP Set", text_color="green")
+            if 'overcurrent' in setpoints:
+                controls.protections["ocp"] = True
+                controls.configure('ocp_status', text="OCP Set", text_color="green")
+            if controls.protections_set:
+                controls.configure('voltage_entry', state="normal")
+                controls.configure('set_voltage_button', state="normal")
+
+        if action == 'output':
+            summary = f"outputs turned {'ON' if on else 'OFF'}"
+        else:
+            summary = "setpoints applied (" + ", ".join(f"{key} {value:g}" for key, value in setpoints.items()) + ")"
+        message = f"Group '{name}': {summary} on {len(result.completed)} channel(s)"
+        if result.skew is not None:
+            message += f", skew {result.skew * 1000:.1f} ms"
+        if result.errors:
+            message += f", {len(result.errors)} device(s) failed"
+        self.log_message(message)
+        self.show_group_status(message)
+
+    def show_group_status(self, text):
+        if self.group_window is not None and self.group_window.winfo_exists():
+            self.group_window.show_status(text)
+
+    def process_measurements(self):
+        """Show the samples queued by the measurement workers since the last call"""
+        results = self.measurement_engine.results
+        try:
+            # Bound the work done per call so a backlog cannot freeze the GUI
+            for _ in range(500):
+                kind, device, channel, *payload = results.get_nowait()
+
+                controls = self.channel_index.get((device, channel))
+                if controls is None:
+                    continue
+                info = controls.info
+
+                if kind == 'sample':
+                    timestamp, (voltage, current, power) = payload
+                    self.measurement_store.append(device, channel, timestamp, (voltage, current, power))
+                    self.show_measurement(controls, voltage, current, power)
+                elif kind == 'missed':
+                    self.log_message(f"Missed {payload[0]} measurement deadlines", device, info, channel)
+                else:
+                    # Stop polling a channel that does not answer anymore
+                    self.measurement_engine.stop_channel(device, channel)
+                    controls.configure('monitor_switch', selected=False)
+                    self.log_message(f"Monitoring stopped: {payload[0]}", device, info, channel)
+        except queue.Empty:
+            pass
+
+        # A recorder that hit a disk error has stopped writing
+        if self.recorder is not None and self.recorder.error:
+            self.log_message(f"Recording failed: {self.recorder.error}")
+            self.record_switch.deselect()
+            self.stop_recording()
+
+        self.after(50, self.process_measurements)
+
+    def toggle_recording(self):
+        if self.record_switch.get():
+            self.start_recording()
+        else:
+            self.stop_recording()
+
+    def start_recording(self):
+        """Stream every measured sample to files configured in the [recording] section"""
+        config = load_config()
+        directory = config.get('recording', 'directory', fallback='recordings')
+        if not os.path.isabs(directory):
+            directory = os.path.join(os.path.dirname(CONFIG_PATH), directory)
+
+        try:
+            self.recorder = MeasurementRecorder(
+                directory,
+                config.get('recording', 'format', fallback='csv'),
+                max_bytes=int(config.getfloat('recording', 'max_size_mb', fallback=100) * 1024 * 1024),
+                max_seconds=config.getfloat('recording', 'max_minutes', fallback=60) * 60
+            )
+        except ValueError as e:
+            self.log_message(f"Cannot start recording: {str(e)}")
+            self.record_switch.deselect()
+            return
+
+        self.recorder.start()
+        self.measurement_engine.add_sink(self.recorder.record)
+        self.log_message(f"Recording {self.recorder.file_format} to {directory}")
+
+    def stop_recording(self, timeout=None):
+        """Stop the recorder; its queued samples are written in the background unless timeout is given"""
+        if self.recorder is None:
+            return
+        recorder, self.recorder = self.recorder, None
+        self.measurement_engine.remove_sink(recorder.record)
+        if timeout is None:
+            recorder.stop(timeout=0)
+            self.finish_recording(recorder)
+        else:
+            recorder.stop(timeout)
+            self.log_recording_summary(recorder)
+
+    def finish_recording(self, recorder):
+        """Wait for the recorder thread to drain its queue without blocking the window"""
+        if recorder.is_alive():
+            self.after(50, self.finish_recording, recorder)
+            return
+        self.log_recording_summary(recorder)
+
+    def log_recording_summary(self, recorder):
+        message = f"Recording stopped: {recorder.written} samples in {len(recorder.paths)} file(s)"
+        if recorder.dropped:
+            message += f", {recorder.dropped} dropped"
+        self.log_message(message)
@@ -0,0 +1,586 @@
+"""Continuous measurement, history, recording and chart decimation
+
+Sampling runs on one worker thread per device, each channel on a fixed grid
+at its own rate; missed deadlines are counted rather than caught up. Samples
+are kept in fixed-size ring buffers of 32 bytes per sample, drawn through an
+incremental min-max decimation so spikes stay visible, and can be streamed to
+CSV or binary files by a background writer that drops samples instead of
+blocking when the disk falls behind.
+"""
+
+import os
+import re
+import math
+import struct
+import time
+import threading
+import queue
+from array import array
+from datetime import datetime
+
+from power_supply import PowerSupply
+
+READING_PATTERN = re.compile(r'[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?')
+
+def parse_reading(reading):
+    """Extract the number of an instrument reading such as '12.003 V', NaN if there is none"""
+    match = READING_PATTERN.search(reading)
+    return float(match.group()) if match else math.nan
+
+class ChannelHistory:
+    """Preallocated ring buffer of (timestamp, voltage, current, power) samples
+
+    Each field is stored in its own array of doubles, so a field can be read
+    as memoryview slices of the buffer without copying. Appends and reads are
+    expected from a single thread (the Tk main loop).
+    """
+
+    FIELDS = ('timestamp', 'voltage', 'current', 'power')
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.columns = {field: array('d', bytes(8 * capacity)) for field in self.FIELDS}
+        self.head = 0  # Slot of the next sample
+        self.count = 0  # Samples currently stored
+        self.total = 0  # Samples appended since creation, to let readers catch up incrementally
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, voltage, current, power):
+        index = self.head
+        columns = self.columns
+        columns['timestamp'][index] = timestamp
+        columns['voltage'][index] = voltage
+        columns['current'][index] = current
+        columns['power'][index] = power
+
+        self.head = (index + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.total += 1
+
+    def segments(self, field, last=None):
+        """Return the newest `last` values of a field as zero-copy slices, oldest first
+
+        A full buffer wraps around, so the values come as at most two memoryviews.
+        """
+        count = self.count if last is None else max(min(last, self.count), 0)
+        view = memoryview(self.columns[field])
+        start = (self.head - count) % self.capacity
+        if count == 0:
+            return []
+        if start + count <= self.capacity:
+            return [view[start:start + count]]
+        return [view[start:], view[:self.head]]
+
+    def values(self, field, last=None):
+        """Copy the newest `last` values of a field into a list, oldest first"""
+        values = []
+        for segment in self.segments(field, last):
+            values.extend(segment)
+        return values
+
+    def as_numpy(self, field, last=None):
+        """Return the newest `last` values of a field as NumPy arrays sharing the buffer"""
+        import numpy
+        return [numpy.frombuffer(segment, dtype=numpy.float64) for segment in self.segments(field, last)]
+
+    def latest(self):
+        """Return the most recent (timestamp, voltage, current, power) sample, None if empty"""
+        if not self.count:
+            return None
+        index = (self.head - 1) % self.capacity
+        return tuple(self.columns[field][index] for field in self.FIELDS)
+
+class MeasurementStore:
+    """Measurement histories keyed by (device, channel), the identity of a device frame"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.histories = {}
+
+    def history(self, device, channel):
+        """Return the history of a channel, creating an empty one on first use"""
+        key = (device, channel)
+        history = self.histories.get(key)
+        if history is None:
+            history = ChannelHistory(self.capacity)
+            self.histories[key] = history
+        return history
+
+    def append(self, device, channel, timestamp, values):
+        """Store the raw (voltage, current, power) readings of a sample as numbers"""
+        voltage, current, power = values
+        self.history(device, channel).append(
+            timestamp, parse_reading(voltage), parse_reading(current), parse_reading(power))
+
+    def remove(self, device, channel):
+        self.histories.pop((device, channel), None)
+
+class MinMaxDecimator:
+    """Incremental min-max reduction of one history field to a bounded number of buckets
+
+    Each bucket keeps the lowest and highest value of the samples it covers, so
+    spikes stay visible however long the acquisition runs. New samples are folded
+    in as they arrive, and neighbouring buckets are merged once there are more than
+    twice `width` of them. An update therefore costs O(width) plus the samples
+    appended since the previous update, whatever the length of the history.
+    """
+
+    def __init__(self, field, width):
+        self.field = field
+        self.width = max(width, 1)
+        self.bucket_size = 1
+        self.buckets = []  # [first sample index, samples covered, t_min, v_min, t_max, v_max]
+        self.consumed = 0  # history.total at the previous update
+
+    def update(self, history):
+        # Forget buckets whose samples have been overwritten in the ring buffer
+        oldest = history.total - history.count
+        expired = 0
+        while expired < len(self.buckets) and sum(self.buckets[expired][:2]) <= oldest:
+            expired += 1
+        del self.buckets[:expired]
+
+        start = max(self.consumed, oldest)
+        new = history.total - start
+        if new > 0:
+            timestamps = history.values('timestamp', new)
+            values = history.values(self.field, new)
+            for offset in range(new):
+                self.add(start + offset, timestamps[offset], values[offset])
+        self.consumed = history.total
+
+        while len(self.buckets) > 2 * self.width:
+            self.merge()
+
+    def add(self, index, timestamp, value):
+        if math.isnan(value):
+            return
+        if self.buckets and index < self.buckets[-1][0] + self.bucket_size:
+            bucket = self.buckets[-1]
+            bucket[1] = index - bucket[0] + 1
+            if value < bucket[3]:
+                bucket[2], bucket[3] = timestamp, value
+            if value > bucket[5]:
+                bucket[4], bucket[5] = timestamp, value
+        else:
+            self.buckets.append([index, 1, timestamp, value, timestamp, value])
+
+    def merge(self):
+        """Halve the number of buckets by merging neighbours pairwise"""
+        merged = []
+        for position in range(0, len(self.buckets) - 1, 2):
+            first, second = self.buckets[position], self.buckets[position + 1]
+            low = first if first[3] <= second[3] else second
+            high = first if first[5] >= second[5] else second
+            merged.append([first[0], second[0] + second[1] - first[0], low[2], low[3], high[4], high[5]])
+        if len(self.buckets) % 2:
+            merged.append(self.buckets[-1])
+        self.buckets = merged
+        self.bucket_size *= 2
+
+    def points(self, since=None):
+        """Return the (timestamp, value) points to draw, in time order
+
+        The first bucket can still hold extremes of samples that have since been
+        overwritten in the history: points older than since are left out.
+        """
+        points = []
+        for first, covered, t_min, v_min, t_max, v_max in self.buckets:
+            if t_min <= t_max:
+                points.append((t_min, v_min))
+                points.append((t_max, v_max))
+            else:
+                points.append((t_max, v_max))
+                points.append((t_min, v_min))
+        if since is not None:
+            points = [point for point in points if point[0] >= since]
+        return points
+
+class MeasurementRecorder(threading.Thread):
+    """Stream measurement samples to disk from a background thread
+
+    record() never blocks: samples are queued and the writer thread appends them
+    in batches. If the disk cannot keep up and the queue fills up, new samples are
+    dropped and counted rather than stalling acquisition. Files are rotated once
+    they reach max_bytes or have been open for max_seconds.
+
+    Two formats are supported: 'csv', and 'binary' for long high-rate captures,
+    a stream of CHANNEL_RECORD definitions and SAMPLE_RECORD entries after
+    BINARY_MAGIC (see read_recording).
+    """
+
+    FORMATS = ('csv', 'binary')
+    BINARY_MAGIC = b'ALIMREC1'
+    CHANNEL_RECORD = struct.Struct('<cHH')  # b'C', channel id, name length, then the UTF-8 name
+    SAMPLE_RECORD = struct.Struct('<cHdfff')  # b'S', channel id, timestamp, voltage, current, power
+    QUEUE_SIZE = 100000
+    BATCH_SIZE = 1000
+    FLUSH_INTERVAL = 0.5  # Seconds between two writes when samples trickle in
+
+    def __init__(self, directory, file_format='csv', max_bytes=100 * 1024 * 1024, max_seconds=3600):
+        super().__init__(name="recorder", daemon=True)
+        if file_format not in self.FORMATS:
+            raise ValueError(f"Unknown recording format: {file_format}")
+        self.directory = directory
+        self.file_format = file_format
+        self.max_bytes = max_bytes
+        self.max_seconds = max_seconds
+
+        self.queue = queue.Queue(self.QUEUE_SIZE)
+        self.running = True
+        self.file = None
+        self.path = None
+        self.paths = []
+        self.opened_at = 0
+        self.file_bytes = 0
+        self.channel_ids = {}
+        self.written = 0
+        self.dropped = 0
+        self.error = None
+
+    def record(self, device, channel, timestamp, values):
+        """Queue a raw (voltage, current, power) sample for writing"""
+        try:
+            self.queue.put_nowait((device, channel, timestamp, values))
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self, timeout=5.0):
+        """Write what is still queued, close the file and end the thread"""
+        self.running = False
+        self.join(timeout)
+
+    def run(self):
+        try:
+            while self.running or not self.queue.empty():
+                try:
+                    batch = [self.queue.get(timeout=self.FLUSH_INTERVAL)]
+                except queue.Empty:
+                    continue
+                try:
+                    while len(batch) < self.BATCH_SIZE:
+                        batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    pass
+                self.write_batch(batch)
+        except OSError as e:
+            self.error = str(e)
+        finally:
+            self.close_file()
+
+    def write_batch(self, batch):
+        now = time.time()
+        if self.file is None or self.file_bytes >= self.max_bytes or now - self.opened_at >= self.max_seconds:
+            self.open_file(now)
+
+        if self.file_format == 'csv':
+            lines = []
+            for device, channel, timestamp, values in batch:
+                voltage, current, power = (parse_reading(value) for value in values)
+                iso_time = datetime.fromtimestamp(timestamp).isoformat(timespec='milliseconds')
+                lines.append(f"{timestamp:.6f},{iso_time},"
+                             f"{device},{channel or ''},{voltage!r},{current!r},{power!r}\n")
+            data = ''.join(lines).encode('utf-8')
+        else:
+            data = bytearray()
+            for device, channel, timestamp, values in batch:
+                channel_id = self.channel_ids.get((device, channel))
+                if channel_id is None:
+                    # Channel names are defined once per file, samples refer to them by id
+                    channel_id = len(self.channel_ids)
+                    self.channel_ids[(device, channel)] = channel_id
+                    name = f"{device}|{channel or ''}".encode('utf-8')
+                    data += self.CHANNEL_RECORD.pack(b'C', channel_id, len(name)) + name
+                data += self.SAMPLE_RECORD.pack(b'S', channel_id, timestamp,
+                                                *(parse_reading(value) for value in values))
+
+        self.file.write(data)
+        self.file.flush()
+        self.file_bytes += len(data)
+        self.written += len(batch)
+
+    def open_file(self, now):
+        """Start a new recording file, closing the previous one"""
+        self.close_file()
+        os.makedirs(self.directory, exist_ok=True)
+
+        extension = 'csv' if self.file_format == 'csv' else 'alimrec'
+        stamp = time.strftime("%Y%m%d_%H%M%S", time.localtime(now))
+        path = os.path.join(self.directory, f"recording_{stamp}.{extension}")
+        suffix = 1
+        while os.path.exists(path):
+            path = os.path.join(self.directory, f"recording_{stamp}_{suffix}.{extension}")
+            suffix += 1
+
+        self.file = open(path, 'wb', buffering=1024 * 1024)
+        self.path = path
+        self.paths.append(path)
+        self.opened_at = now
+        self.channel_ids = {}
+        if self.file_format == 'csv':
+            header = b"timestamp,time,device,channel,voltage,current,power\n"
+        else:
+            header = self.BINARY_MAGIC
+        self.file.write(header)
+        self.file_bytes = len(header)
+
+    def close_file(self):
+        if self.file is not None:
+            try:
+                self.file.close()
+            except OSError:
+                pass
+            self.file = None
+
+def read_recording(path):
+    """Yield (device, channel, timestamp, voltage, current, power) from a binary recording"""
+    recorder = MeasurementRecorder
+    channels = {}
+    with open(path, 'rb') as recording:
+        if recording.read(len(recorder.BINARY_MAGIC)) != recorder.BINARY_MAGIC:
+            raise ValueError(f"{path} is not a binary measurement recording")
+        while True:
+            tag = recording.read(1)
+            if not tag:
+                return
+            if tag == b'C':
+                rest = recording.read(recorder.CHANNEL_RECORD.size - 1)
+                if len(rest) < recorder.CHANNEL_RECORD.size - 1:
+                    return
+                _, channel_id, length = recorder.CHANNEL_RECORD.unpack(tag + rest)
+                device, _, channel = recording.read(length).decode('utf-8').rpartition('|')
+                channels[channel_id] = (device, channel or None)
+            elif tag == b'S':
+                rest = recording.read(recorder.SAMPLE_RECORD.size - 1)
+                if len(rest) < recorder.SAMPLE_RECORD.size - 1:
+                    return  # Truncated last record of an interrupted capture
+                _, channel_id, timestamp, voltage, current, power = recorder.SAMPLE_RECORD.unpack(tag + rest)
+                device, channel = channels[channel_id]
+                yield device, channel, timestamp, voltage, current, power
+            else:
+                raise ValueError(f"Corrupted recording {path}")
+
+class ChannelSchedule:
+    """Fixed-rate deadline grid of one monitored channel"""
+
+    def __init__(self, channel, rate_hz):
+        self.channel = channel
+        self.paused = False
+        self.missed = 0
+        self.set_rate(rate_hz)
+
+    @staticmethod
+    def check_rate(rate_hz):
+        if not 0 < rate_hz < math.inf:
+            raise ValueError(f"Sampling rate must be a positive number of Hz, not {rate_hz}")
+
+    def set_rate(self, rate_hz):
+        self.check_rate(rate_hz)
+        self.period = 1.0 / rate_hz
+        self.realign()
+
+    def realign(self):
+        """Restart the grid from now, e.g. after a pause or a rate change"""
+        self.next_due = time.monotonic()
+
+    def advance(self, now):
+        """Step to the next deadline of the grid, skipping and counting the ones already passed"""
+        self.next_due += self.period
+        if now > self.next_due:
+            skipped = int((now - self.next_due) / self.period) + 1
+            self.missed += skipped
+            self.next_due += skipped * self.period
+
+class DevicePoller(threading.Thread):
+    """Worker thread sampling the monitored channels of one device"""
+
+    def __init__(self, engine, device):
+        super().__init__(name=f"poller {device}", daemon=True)
+        self.engine = engine
+        self.device = device
+        self.schedules = {}
+        self.running = True
+        self.last_missed_report = time.monotonic()
+        self.condition = threading.Condition()
+
+    def update(self, action):
+        """Apply a change to the schedules and wake the worker up"""
+        with self.condition:
+            result = action(self.schedules)
+            self.condition.notify()
+            return result
+
+    def align(self, schedule):
+        """Put a schedule on the grid of a sibling with the same rate, so both share queries"""
+        for other in self.schedules.values():
+            if other is not schedule and not other.paused and other.period == schedule.period:
+                schedule.next_due = other.next_due
+                return
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+    def next_schedules(self):
+        """Wait for the earliest deadline of the active channels, None once stopped
+
+        Channels falling due together are returned together, so that they can
+        share a single channel-list query.
+        """
+        with self.condition:
+            while self.running:
+                active = [schedule for schedule in self.schedules.values()
+                          if not schedule.paused and not self.engine.paused]
+                if not active:
+                    self.condition.wait()
+                    continue
+
+                now = time.monotonic()
+                delay = min(schedule.next_due for schedule in active) - now
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                return [schedule for schedule in active
+                        if schedule.next_due <= now + MeasurementEngine.GROUP_TOLERANCE]
+            return None
+
+    def run(self):
+        while True:
+            schedules = self.next_schedules()
+            if schedules is None:
+                return
+
+            channels = [schedule.channel for schedule in schedules]
+            try:
+                samples = self.engine.measure(self.device, channels)
+                timestamp = time.time()
+                for channel, values in zip(channels, samples):
+                    self.engine.results.put(('sample', self.device, channel, timestamp, values))
+                    for sink in self.engine.sinks:
+                        sink(self.device, channel, timestamp, values)
+            except Exception as e:
+                for channel in channels:
+                    self.engine.results.put(('error', self.device, channel, str(e)))
+
+            with self.condition:
+                now = time.monotonic()
+                for schedule in schedules:
+                    schedule.advance(now)
+                self.report_missed()
+
+    def report_missed(self):
+        """Forward missed deadlines to the GUI, at most once per report interval"""
+        now = time.monotonic()
+        if now - self.last_missed_report < MeasurementEngine.MISSED_REPORT_INTERVAL:
+            return
+        self.last_missed_report = now
+        for schedule in self.schedules.values():
+            if schedule.missed:
+                self.engine.results.put(('missed', self.device, schedule.channel, schedule.missed))
+                schedule.missed = 0
+
+class MeasurementEngine:
+    """Continuous acquisition of connected channels, off the Tk main loop
+
+    Each device is polled by its own worker thread, every channel on a drift-free
+    grid at its own rate. Results are queued as ('sample', device, channel,
+    timestamp, (voltage, current, power)), ('error', device, channel, message)
+    or ('missed', device, channel, count) for the GUI to consume with after().
+    Channels of a device that fall due together are measured in one batch.
+    """
+
+    MISSED_REPORT_INTERVAL = 5.0  # Seconds between two missed deadline reports of a device
+    GROUP_TOLERANCE = 0.002  # Channels due within this many seconds are measured together
+
+    def __init__(self, measure=None):
+        self.measure = measure or MeasurementEngine.measure_channels
+        self.results = queue.Queue()
+        self.sinks = []  # Non-blocking callables fed every sample from the worker threads
+        self.pollers = {}
+        self.paused = False
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def measure_channels(device, channels):
+        with PowerSupply.session(device) as power_supply:
+            return power_supply.measure_channels(channels)
+
+    def add_sink(self, sink):
+        self.sinks = self.sinks + [sink]
+
+    def remove_sink(self, sink):
+        self.sinks = [other for other in self.sinks if other is not sink]
+
+    def start_channel(self, device, channel, rate_hz):
+        """Start sampling a channel, or change its rate if it is already monitored"""
+        ChannelSchedule.check_rate(rate_hz)
+        with self.lock:
+            poller = self.pollers.get(device)
+            if poller is None:
+                poller = DevicePoller(self, device)
+                self.pollers[device] = poller
+                poller.start()
+
+        def start(schedules):
+            if channel in schedules:
+                schedules[channel].set_rate(rate_hz)
+            else:
+                schedules[channel] = ChannelSchedule(channel, rate_hz)
+            poller.align(schedules[channel])
+        poller.update(start)
+
+    def stop_channel(self, device, channel):
+        with self.lock:
+            poller = self.pollers.get(device)
+            if poller is None:
+                return
+
+            def remove(schedules):
+                schedules.pop(channel, None)
+                return len(schedules)
+            if not poller.update(remove):
+                # Last channel of the device: retire its worker
+                poller.stop()
+                del self.pollers[device]
+
+    def is_monitoring(self, device, channel):
+        poller = self.pollers.get(device)
+        return poller is not None and channel in poller.schedules
+
+    def set_channel_paused(self, device, channel, paused):
+        poller = self.pollers.get(device)
+        if poller is None:
+            return
+
+        def set_paused(schedules):
+            schedule = schedules.get(channel)
+            if schedule is not None and schedule.paused != paused:
+                schedule.paused = paused
+                schedule.realign()
+                poller.align(schedule)
+        poller.update(set_paused)
+
+    def pause(self):
+        """Suspend every channel, keeping their rates"""
+        self.paused = True
+
+    def resume(self):
+        self.paused = False
+
+        # Restart every grid from now so the pause is not reported as missed deadlines
+        def realign(schedules):
+            for schedule in schedules.values():
+                schedule.realign()
+        for poller in list(self.pollers.values()):
+            poller.update(realign)
+
+    def stop(self):
+        """Stop every worker"""
+        with self.lock:
+            for poller in self.pollers.values():
+                poller.stop()
+            self.pollers.clear()
@@ -0,0 +1,685 @@
+"""VISA sessions, device discovery and device names
+
+Every handler of a resource shares one pooled session, opened on first use,
+health-checked before reuse and closed after POOL_IDLE_TIMEOUT seconds
+without a holder. A session found dead is replaced; the old one is closed by
+its last holder.
+
+Discovery probes resources in parallel, at most max_workers at a time, and
+yields each device as soon as it answers. A probe that overruns its deadline
+is reported unidentified and gives its slot to the next resource. Identified
+devices are cached in discovery_cache.json for cache_ttl seconds; cached
+devices are confirmed with a short probe and only fall back to a full one
+when it fails.
+
+Measurements are sent as one chained query, and as one channel-list query
+when several outputs are read together. Support for both is detected on first
+use per resource; devices rejecting them get individual queries.
+"""
+
+import pyvisa
+import configparser
+import os
+import json
+import time
+import threading
+import queue
+from bisect import bisect_left
+from contextlib import contextmanager
+
+import drivers
+
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'alimentation.ini')
+DISCOVERY_CACHE_PATH = os.path.join(os.path.dirname(CONFIG_PATH), 'discovery_cache.json')
+
+def load_config():
+    """Read alimentation.ini, returning an empty configuration if it is missing"""
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    if os.path.exists(CONFIG_PATH):
+        config.read(CONFIG_PATH)
+    return config
+
+class DeviceNameResolver:
+    """Map *IDN? answers to the display names of the [device_names] section"""
+
+    CHECK_INTERVAL = 1.0  # Seconds between two mtime checks of the configuration file
+
+    def __init__(self, config_path=CONFIG_PATH):
+        self.config_path = config_path
+        self.mtime = None
+        self.last_check = None
+        self.model_ids = []  # Longest first, so the most specific key wins
+        self.names = {}
+        self.resolved = {}  # Memoized info -> display name
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.lock = threading.Lock()
+
+    def reload_if_changed(self):
+        """Re-parse the configuration file only when its modification time changed"""
+        now = time.monotonic()
+        if self.last_check is not None and now - self.last_check < self.CHECK_INTERVAL:
+            return
+        self.last_check = now
+
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self.mtime and self.reloads:
+            return
+
+        names = {}
+        if mtime is not None:
+            config = configparser.ConfigParser()
+            config.optionxform = str
+            config.read(self.config_path)
+            if 'device_names' in config:
+                names = dict(config['device_names'])
+
+        self.mtime = mtime
+        self.names = names
+        self.model_ids = sorted(names, key=len, reverse=True)
+        self.resolved = {}
+        self.reloads += 1
+
+    def resolve(self, info):
+        """Return the configured name of the longest model id found in info"""
+        with self.lock:
+            self.reload_if_changed()
+
+            name = self.resolved.get(info)
+            if name is not None:
+                self.hits += 1
+                return name
+
+            self.misses += 1
+            # Default to first part of info if no match
+            name = next((self.names[model_id] for model_id in self.model_ids if model_id in info),
+                        info.split(',')[0])
+            self.resolved[info] = name
+            return name
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'reloads': self.reloads,
+                'entries': len(self.resolved)}
+
+class CommandStats:
+    """Latency histograms of the SCPI commands, per resource, command mnemonic and outcome"""
+
+    # Upper bounds of the histogram buckets in seconds, doubling from 0.1 ms to about 13 s
+    BOUNDS = tuple(0.0001 * 2 ** index for index in range(18))
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # (resource, mnemonic, outcome) -> [count, total, minimum, maximum, bucket counts]
+        self.entries = {}
+        self.started = time.time()
+
+    @staticmethod
+    def mnemonic(command):
+        """Command headers without their arguments, e.g. 'VOLT 12 (@1)' -> 'VOLT'"""
+        headers = (part.strip().split(' ', 1)[0].lstrip(':').upper() for part in command.split(';'))
+        return ';'.join(header for header in headers if header)
+
+    @staticmethod
+    def outcome(error):
+        if error is None:
+            return 'ok'
+        if (isinstance(error, pyvisa.errors.VisaIOError)
+                and error.error_code == pyvisa.constants.StatusCode.error_timeout):
+            return 'timeout'
+        return 'error'
+
+    def record(self, resource_name, command, seconds, outcome):
+        key = (resource_name, self.mnemonic(command), outcome)
+        bucket = bisect_left(self.BOUNDS, seconds)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = [0, 0.0, seconds, seconds, [0] * (len(self.BOUNDS) + 1)]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = min(entry[2], seconds)
+            entry[3] = max(entry[3], seconds)
+            entry[4][bucket] += 1
+
+    def percentile(self, buckets, count, maximum, fraction):
+        """Upper bound of the bucket holding the given fraction of the samples"""
+        rank = fraction * count
+        seen = 0
+        for index, bucket_count in enumerate(buckets):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.BOUNDS[index], maximum) if index < len(self.BOUNDS) else maximum
+        return maximum
+
+    def snapshot(self):
+        """Return one dictionary per (resource, command, outcome), latencies in milliseconds"""
+        with self.lock:
+            entries = [(key, entry[:4] + [list(entry[4])]) for key, entry in self.entries.items()]
+
+        rows = []
+        for (resource_name, mnemonic, outcome), (count, total, minimum, maximum, buckets) in sorted(entries):
+            histogram = {}
+            for index, bucket_count in enumerate(buckets):
+                if bucket_count:
+                    label = f"<={self.BOUNDS[index] * 1000:g}" if index < len(self.BOUNDS) else "more"
+                    histogram[label] = bucket_count
+            rows.append({
+                'resource': resource_name,
+                'command': mnemonic,
+                'outcome': outcome,
+                'count': count,
+                'mean_ms': round(total / count * 1000, 3),
+                'min_ms': round(minimum * 1000, 3),
+                'max_ms': round(maximum * 1000, 3),
+                'p50_ms': round(self.percentile(buckets, count, maximum, 0.50) * 1000, 3),
+                'p95_ms': round(self.percentile(buckets, count, maximum, 0.95) * 1000, 3),
+                'p99_ms': round(self.percentile(buckets, count, maximum, 0.99) * 1000, 3),
+                'histogram_ms': histogram,
+            })
+        return rows
+
+    def export_json(self, path):
+        with open(path, 'w', encoding='utf-8') as export_file:
+            json.dump({'started': self.started, 'exported': time.time(), 'commands': self.snapshot()},
+                      export_file, indent=2)
+
+    def reset(self):
+        with self.lock:
+            self.entries = {}
+            self.started = time.time()
+
+class PowerSupply:
+    _rm = None
+    _rm_lock = threading.Lock()
+
+    # Open sessions keyed by resource name, shared by every handler
+    _pool = {}
+    _pool_lock = threading.Lock()
+    _resource_locks = {}  # Serializes opening and checking the session of each resource
+    _stale = set()  # Replaced sessions still referenced, closed by their last release
+    POOL_IDLE_TIMEOUT = 300  # Seconds before an unreferenced session is closed
+    POOL_HEALTH_CHECK_INTERVAL = 30  # Seconds between two liveness checks of a session
+
+    # Batched query support detected per resource: {resource: {kind: bool}}
+    _batch_support = {}
+
+    # Driver of each identified resource, picked from its *IDN? answer
+    _drivers = {}
+
+    # Per-command latency histograms, None while the instrumentation is disabled
+    command_stats = None
+
+    # Discovery defaults, overridden by the [discovery] section of alimentation.ini
+    DISCOVERY_TIMEOUT_MS = 1500
+    DISCOVERY_MAX_WORKERS = 8
+    DISCOVERY_CACHE_TTL = 7 * 24 * 3600  # Seconds a cached *IDN? answer is trusted, 0 disables the cache
+    DISCOVERY_VERIFY_TIMEOUT_MS = 500  # Deadline for re-checking a cached device before a full probe
+
+    @staticmethod
+    def resource_manager():
+        """Return the shared ResourceManager, creating it on first use from any thread"""
+        if PowerSupply._rm is None:
+            with PowerSupply._rm_lock:
+                if PowerSupply._rm is None:
+                    # Naming the backend avoids the slow fallback between VISA implementations
+                    config = load_config()
+                    backend = config.get('visa', 'backend', fallback='').strip()
+                    if backend == 'sim':
+                        from simulator import SimulatedResourceManager
+                        PowerSupply._rm = SimulatedResourceManager.from_config(config)
+                    else:
+                        PowerSupply._rm = pyvisa.ResourceManager(backend) if backend else pyvisa.ResourceManager()
+                    if config.getboolean('diagnostics', 'command_stats', fallback=False):
+                        PowerSupply.enable_command_stats()
+        return PowerSupply._rm
+
+    @staticmethod
+    def enable_command_stats(enabled=True):
+        """Start or stop timing every command; collected statistics are kept while enabled"""
+        if not enabled:
+            PowerSupply.command_stats = None
+        elif PowerSupply.command_stats is None:
+            PowerSupply.command_stats = CommandStats()
+        return PowerSupply.command_stats
+
+    @staticmethod
+    def transfer(resource_name, operation, command):
+        """Run a write or query on a device, timing it when command statistics are enabled"""
+        stats = PowerSupply.command_stats
+        if stats is None:
+            return operation(command)
+
+        started = time.perf_counter()
+        try:
+            result = operation(command)
+        except Exception as error:
+            stats.record(resource_name, command, time.perf_counter() - started, stats.outcome(error))
+            raise
+        stats.record(resource_name, command, time.perf_counter() - started, 'ok')
+        return result
+
+    @staticmethod
+    def warm_up():
+        """Load the VISA backend ahead of the first scan and return its description"""
+        return str(PowerSupply.resource_manager().visalib)
+
+    @staticmethod
+    def discovery_settings():
+        """Return the (timeout_ms, max_workers) pair used to probe resources"""
+        config = load_config()
+        timeout_ms = config.getint('discovery', 'timeout_ms', fallback=PowerSupply.DISCOVERY_TIMEOUT_MS)
+        max_workers = config.getint('discovery', 'max_workers', fallback=PowerSupply.DISCOVERY_MAX_WORKERS)
+        return max(timeout_ms, 1), max(max_workers, 1)
+
+    @staticmethod
+    def identify_device(device, timeout_ms):
+        """Open a single resource, ask for *IDN? and close it again"""
+        inst = None
+        try:
+            # timeout bounds the query; the open itself is only bounded by the deadline
+            # iter_available_devices enforces on each probe
+            inst = PowerSupply.resource_manager().open_resource(device, timeout=timeout_ms)
+            return device, PowerSupply.transfer(device, inst.query, '*IDN?').strip()
+        except:
+            return device, "Unable to identify"
+        finally:
+            if inst is not None:
+                try:
+                    inst.close()
+                except:
+                    pass
+
+    @staticmethod
+    def verify_timeout(timeout_ms):
+        """Deadline of the short probe confirming a cached identity, in milliseconds"""
+        config = load_config()
+        verify_timeout = config.getint('discovery', 'verify_timeout_ms',
+                                       fallback=PowerSupply.DISCOVERY_VERIFY_TIMEOUT_MS)
+        return max(min(verify_timeout, timeout_ms), 1)
+
+    @staticmethod
+    def verify_device(device, idn, timeout_ms):
+        """Confirm a cached identity with a short probe, falling back to a full one"""
+        result = PowerSupply.identify_device(device, PowerSupply.verify_timeout(timeout_ms))
+        if result[1] != "Unable to identify":
+            return result
+
+        # The cached device did not answer in time, give it the full deadline
+        return PowerSupply.identify_device(device, timeout_ms)
+
+    @staticmethod
+    def channel_count(idn):
+        """Number of output channels of a device, from its *IDN? answer"""
+        return drivers.driver_for(idn).channels
+
+    @staticmethod
+    def remember_driver(resource_name, idn):
+        """Cache the driver matching the *IDN? answer of a resource and return it"""
+        driver = drivers.driver_for(idn)
+        if PowerSupply._drivers.get(resource_name) is not driver:
+            PowerSupply._drivers[resource_name] = driver
+            # Another model now answers on this resource: start from its declared capabilities
+            PowerSupply._batch_support.pop(resource_name, None)
+        return driver
+
+    @staticmethod
+    def driver_of(resource_name):
+        """Return the cached driver of a resource, asking the device for *IDN? when unknown"""
+        driver = PowerSupply._drivers.get(resource_name)
+        if driver is None:
+            with PowerSupply.session(resource_name) as power_supply:
+                driver = power_supply.driver
+        return driver
+
+    @staticmethod
+    def load_discovery_cache():
+        """Return the {device: entry} discovery cache, without entries older than the TTL"""
+        config = load_config()
+        ttl = config.getint('discovery', 'cache_ttl', fallback=PowerSupply.DISCOVERY_CACHE_TTL)
+        if ttl <= 0:
+            return {}
+
+        try:
+            with open(DISCOVERY_CACHE_PATH, 'r', encoding='utf-8') as cache_file:
+                cache = json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(cache, dict):
+            return {}
+
+        now = time.time()
+        return {device: entry for device, entry in cache.items()
+                if isinstance(entry, dict) and 'idn' in entry
+                and now - entry.get('timestamp', 0) < ttl}
+
+    @staticmethod
+    def save_discovery_cache(results):
+        """Merge (device, idn) probe results into the discovery cache file"""
+        cache = PowerSupply.load_discovery_cache()
+        for device, idn in results:
+            if idn == "Unable to identify":
+                cache.pop(device, None)
+                continue
+            fields = [field.strip() for field in idn.split(',')]
+            cache[device] = {
+                'idn': idn,
+                'model': fields[1] if len(fields) > 1 else fields[0],
+                'channels': PowerSupply.channel_count(idn),
+                'timestamp': time.time()
+            }
+
+        # Write to a temporary file first so a crash never leaves a truncated cache
+        try:
+            temp_path = DISCOVERY_CACHE_PATH + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as cache_file:
+                json.dump(cache, cache_file, indent=2)
+            os.replace(temp_path, DISCOVERY_CACHE_PATH)
+        except OSError:
+            pass
+
+    @staticmethod
+    def cached_devices():
+        """Return the (device, idn) pairs remembered from previous scans"""
+        cache = PowerSupply.load_discovery_cache()
+        return [(device, cache[device]['idn']) for device in sorted(cache)]
+
+    @staticmethod
+    def list_resources():
+        """Names of the resources currently known to the VISA library"""
+        return tuple(PowerSupply.resource_manager().list_resources())
+
+    @staticmethod
+    def pooled_resources():
+        """Names of the resources with an open pooled session"""
+        with PowerSupply._pool_lock:
+            return set(PowerSupply._pool)
+
+    @staticmethod
+    def iter_available_devices(devices=None, timeout_ms=None, max_workers=None, use_cache=True):
+        """Probe resources concurrently and yield (device, idn) as each one answers"""
+        default_timeout, default_workers = PowerSupply.discovery_settings()
+        timeout_ms = timeout_ms or default_timeout
+        max_workers = max_workers or default_workers
+
+        if devices is None:
+            devices = PowerSupply.list_resources()
+        if not devices:
+            return
+
+        # Known resources only need their cached identity confirmed
+        cache = PowerSupply.load_discovery_cache() if use_cache else {}
+        results = []
+
+        # Each probe runs on its own daemon thread, at most max_workers at a time. A
+        # probe that overruns its deadline, for instance stuck opening a dead port,
+        # is reported as unidentified and gives its slot to the next resource while
+        # it finishes in the background.
+        answers = queue.Queue()
+
+        def probe(device, function, *args):
+            answers.put((device, function(device, *args)))
+
+        waiting = []
+        for device in devices:
+            if device in cache:
+                waiting.append((device, PowerSupply.verify_device, (cache[device]['idn'], timeout_ms),
+                                (PowerSupply.verify_timeout(timeout_ms) + timeout_ms) / 1000))
+            else:
+                waiting.append((device, PowerSupply.identify_device, (timeout_ms,), timeout_ms / 1000))
+        waiting.reverse()
+        running = {}  # device -> time by which its probe must have answered
+
+        while waiting or running:
+            while waiting and len(running) < max_workers:
+                device, function, args, deadline = waiting.pop()
+                running[device] = time.monotonic() + deadline
+                threading.Thread(target=probe, args=(device, function) + args,
+                                 name=f"discovery {device}", daemon=True).start()
+
+            finished = []
+            try:
+                device, result = answers.get(timeout=max(min(running.values()) - time.monotonic(), 0))
+                # Late answers of abandoned probes are ignored
+                if running.pop(device, None) is not None:
+                    finished.append(result)
+            except queue.Empty:
+                pass
+            now = time.monotonic()
+            for device, expiry in list(running.items()):
+                if now >= expiry:
+                    del running[device]
+                    finished.append((device, "Unable to identify"))
+
+            for result in finished:
+                if result[1] != "Unable to identify":
+                    PowerSupply.remember_driver(*result)
+                results.append(result)
+                yield result
+
+        if use_cache:
+            PowerSupply.save_discovery_cache(results)
+
+    @staticmethod
+    def list_available_devices(timeout_ms=None, max_workers=None, use_cache=True):
+        devices = PowerSupply.list_resources()
+        results = dict(PowerSupply.iter_available_devices(devices, timeout_ms, max_workers, use_cache))
+
+        # Keep the resource manager ordering regardless of which probe finished first
+        return [(device, results.get(device, "Unable to identify")) for device in devices]
+
+    def __init__(self, resource_name):
+        self.resource_name = resource_name
+        self.device = PowerSupply.resource_manager().open_resource(resource_name)
+
+        # Pool bookkeeping, guarded by PowerSupply._pool_lock
+        self.refcount = 0
+        self.last_used = time.monotonic()
+        self.last_checked = self.last_used
+
+        # Serializes I/O when several threads share the session
+        self.lock = threading.RLock()
+
+    def write(self, command):
+        with self.lock:
+            PowerSupply.transfer(self.resource_name, self.device.write, command)
+
+    def query(self, command):
+        with self.lock:
+            return PowerSupply.transfer(self.resource_name, self.device.query, command).strip()
+
+    @property
+    def driver(self):
+        driver = PowerSupply._drivers.get(self.resource_name)
+        if driver is None:
+            driver = PowerSupply.remember_driver(self.resource_name, self.query(drivers.COMMANDS['identify']))
+        return driver
+
+    def capabilities(self):
+        """Batch support of the resource as {kind: bool}, seeded from the driver and completed by probing"""
+        support = PowerSupply._batch_support.get(self.resource_name)
+        if support is None:
+            support = PowerSupply._batch_support.setdefault(self.resource_name, self.driver.batch_support())
+        return support
+
+    def supports_channel_lists(self, channels):
+        """Whether commands can address several channels at once, probed with an OUTP? query if unknown"""
+        support = self.capabilities()
+        if support.get('channel_list') is None and len(channels) > 1 and None not in channels:
+            self.query_batch([self.driver.command('output_state', ','.join(channels))], 'channel_list',
+                             values_per_reply=len(channels))
+        return bool(support.get('channel_list'))
+
+    def flush(self):
+        """Drop whatever a rejected command may have left in the device buffers"""
+        try:
+            self.device.clear()
+        except:
+            pass
+
+    def query_batch(self, commands, kind, values_per_reply=1):
+        """Send several queries as one semicolon-chained command and split the reply
+
+        Returns one list of values per command, or None when the device does not
+        support this kind of batch. Support declared by the driver is trusted,
+        anything else is probed on first use and remembered per resource.
+        """
+        support = self.capabilities()
+        if support.get(kind) is False:
+            return None
+
+        with self.lock:
+            try:
+                replies = self.query(';:'.join(commands)).split(';')
+                rows = [[value.strip() for value in reply.split(',')] for reply in replies]
+                if len(rows) != len(commands) or any(len(row) != values_per_reply for row in rows):
+                    raise ValueError(f"Unexpected reply to batched {kind} query")
+            except Exception:
+                # Once a batch has worked, a failure is a real I/O error
+                if support.get(kind):
+                    raise
+                support[kind] = False
+                self.flush()
+                return None
+
+        support[kind] = True
+        return rows
+
+    def measure(self, channel=None):
+        """Return the (voltage, current, power) readings of an output"""
+        commands = self.driver.measure_commands(channel)
+
+        # Keep the queries together when the session is shared between threads
+        with self.lock:
+            rows = self.query_batch(commands, 'compound')
+            if rows is not None:
+                return tuple(row[0] for row in rows)
+
+            # The device only understands one query at a time
+            return tuple(self.query(command) for command in commands)
+
+    def measure_channels(self, channels):
+        """Return the readings of several outputs, with one channel-list query when supported"""
+        channels = list(channels)
+        if len(channels) < 2 or None in channels:
+            return [self.measure(channel) for channel in channels]
+
+        commands = self.driver.measure_commands(','.join(channels))
+
+        with self.lock:
+            rows = self.query_batch(commands, 'channel_list', values_per_reply=len(channels))
+            if rows is not None:
+                voltages, currents, powers = rows
+                return list(zip(voltages, currents, powers))
+
+            return [self.measure(channel) for channel in channels]
+
+    def close(self):
+        try:
+            self.device.close()
+        except:
+            pass
+
+    def is_healthy(self):
+        """Check that the session still answers, at most once per health check interval"""
+        if time.monotonic() - self.last_checked < PowerSupply.POOL_HEALTH_CHECK_INTERVAL:
+            return True
+        try:
+            self.query('*IDN?')
+        except:
+            return False
+        self.last_checked = time.monotonic()
+        return True
+
+    @staticmethod
+    def acquire(resource_name):
+        """Return the pooled session of a resource, opening it on first use
+
+        The health check and the open run under a lock of their resource only, so
+        a slow or dead device never holds up the sessions of the other devices.
+        """
+        with PowerSupply._pool_lock:
+            resource_lock = PowerSupply._resource_locks.setdefault(resource_name, threading.Lock())
+
+        with resource_lock:
+            with PowerSupply._pool_lock:
+                power_supply = PowerSupply._pool.get(resource_name)
+                if power_supply is not None:
+                    # Referenced from now on, so it cannot be evicted while it is checked
+                    power_supply.refcount += 1
+                    power_supply.last_used = time.monotonic()
+
+            # Replace sessions that stopped answering; other threads may still be using them
+            if power_supply is not None and not power_supply.is_healthy():
+                with PowerSupply._pool_lock:
+                    if PowerSupply._pool.get(resource_name) is power_supply:
+                        del PowerSupply._pool[resource_name]
+                    power_supply.refcount -= 1
+                    unused = power_supply.refcount <= 0
+                    if not unused:
+                        PowerSupply._stale.add(power_supply)
+                if unused:
+                    power_supply.close()
+                power_supply = None
+
+            if power_supply is None:
+                power_supply = PowerSupply(resource_name)
+                with PowerSupply._pool_lock:
+                    power_supply.refcount = 1
+                    power_supply.last_used = time.monotonic()
+                    PowerSupply._pool[resource_name] = power_supply
+            return power_supply
+
+    def release(self, failed=False):
+        """Give back a reference obtained with acquire; the session stays open for reuse
+
+        A session replaced after a failed health check is closed by its last release.
+        """
+        with PowerSupply._pool_lock:
+            self.refcount = max(self.refcount - 1, 0)
+            self.last_used = time.monotonic()
+            if failed:
+                # Force a health check before the session is handed out again
+                self.last_checked = 0
+            retired = self in PowerSupply._stale and self.refcount == 0
+            if retired:
+                PowerSupply._stale.discard(self)
+        if retired:
+            self.close()
+
+    @staticmethod
+    @contextmanager
+    def session(resource_name):
+        """Borrow the pooled session of a resource for the duration of a with block"""
+        power_supply = PowerSupply.acquire(resource_name)
+        try:
+            yield power_supply
+        except:
+            power_supply.release(failed=True)
+            raise
+        power_supply.release()
+
+    @staticmethod
+    def evict_idle(max_idle=None):
+        """Close unreferenced sessions that have not been used for max_idle seconds"""
+        if max_idle is None:
+            max_idle = PowerSupply.POOL_IDLE_TIMEOUT
+        now = time.monotonic()
+        with PowerSupply._pool_lock:
+            for resource_name, power_supply in list(PowerSupply._pool.items()):
+                if power_supply.refcount == 0 and now - power_supply.last_used > max_idle:
+                    power_supply.close()
+                    del PowerSupply._pool[resource_name]
+
+    @staticmethod
+    def close_all():
+        """Close every pooled session regardless of outstanding references"""
+        with PowerSupply._pool_lock:
+            for power_supply in list(PowerSupply._pool.values()) + list(PowerSupply._stale):
+                power_supply.close()
+            PowerSupply._pool.clear()
+            PowerSupply._stale.clear()
@@ -0,0 +1,182 @@
+"""Voltage ramps, staircases and CSV tables played on a channel
+
+Models whose driver declares a list memory get the whole profile uploaded and
+play it at hardware timing. Other models get every step written by a host
+scheduler that keeps a fixed time grid: it sleeps for most of each wait and
+spins for the last SPIN_TIME seconds, then reports the worst step lateness.
+"""
+
+import csv
+import queue
+import threading
+import time
+
+from power_supply import PowerSupply
+
+class Profile:
+    """Voltage profile made of (voltage, dwell seconds) steps"""
+
+    def __init__(self, steps):
+        self.steps = [(float(voltage), float(dwell)) for voltage, dwell in steps]
+        if not self.steps:
+            raise ValueError("A profile needs at least one step")
+        if any(dwell <= 0 for voltage, dwell in self.steps):
+            raise ValueError("Step durations must be positive")
+
+    @property
+    def duration(self):
+        return sum(dwell for voltage, dwell in self.steps)
+
+    @property
+    def max_voltage(self):
+        return max(voltage for voltage, dwell in self.steps)
+
+    @staticmethod
+    def ramp(start, stop, duration, interval=0.1):
+        """Linear ramp from start to stop volts over duration seconds, one step per interval"""
+        if duration <= 0 or interval <= 0:
+            raise ValueError("Ramp duration and interval must be positive")
+        count = max(int(round(duration / interval)), 1)
+        dwell = duration / count
+        steps = [(start + (stop - start) * index / count, dwell) for index in range(1, count + 1)]
+        return Profile(steps)
+
+    @staticmethod
+    def staircase(start, stop, step, dwell):
+        """Levels from start to stop volts in increments of step, each held for dwell seconds"""
+        if step <= 0:
+            raise ValueError("Staircase step must be positive")
+        direction = 1 if stop >= start else -1
+        count = int(abs(stop - start) / step + 1e-9)
+        levels = [start + direction * step * index for index in range(count + 1)]
+        if abs(levels[-1] - stop) > 1e-9:
+            levels.append(stop)
+        return Profile([(level, dwell) for level in levels])
+
+    @staticmethod
+    def from_csv(path):
+        """Read 'voltage,dwell_s' rows, skipping a header line and '#' comments"""
+        steps = []
+        with open(path, 'r', encoding='utf-8', newline='') as table:
+            for line_number, row in enumerate(csv.reader(table), start=1):
+                if not row or not row[0].strip() or row[0].lstrip().startswith('#'):
+                    continue
+                try:
+                    steps.append((float(row[0]), float(row[1])))
+                except (ValueError, IndexError):
+                    if steps or line_number > 1:
+                        raise ValueError(f"{path}, line {line_number}: expected 'voltage,dwell_s'")
+        return Profile(steps)
+
+class SequenceRunner(threading.Thread):
+    """Play a profile on one channel, from the instrument list memory or from a host scheduler
+
+    mode is 'list' to upload the profile, 'host' to write every step from here,
+    or 'auto' to upload when the model supports it. Progress goes to the events
+    queue as ('step', device, channel, index, voltage, lateness), then one
+    ('done', device, channel, summary) or ('error', device, channel, message).
+    The first command waits for the optional ready future, e.g. the end of the
+    operations already queued on the device. Given the StateCache of the
+    controller, the runner keeps the cached voltage of the channel in line with
+    what it writes.
+    """
+
+    SPIN_TIME = 0.002  # The end of every wait polls the clock instead of sleeping, for sub-ms accuracy
+    START_DELAY = 0.05  # Time between the start of the thread and the first step
+
+    def __init__(self, device, channel, profile, mode='auto', events=None, ready=None, state=None):
+        super().__init__(name=f"sequence {device} {channel or ''}", daemon=True)
+        if mode not in ('auto', 'host', 'list'):
+            raise ValueError(f"Unknown sequence mode: {mode}")
+        self.device = device
+        self.channel = channel
+        self.profile = profile
+        self.mode = mode
+        self.events = events if events is not None else queue.Queue()
+        self.ready = ready
+        self.state = state
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def wait_until(self, deadline):
+        """Sleep until deadline (perf_counter), returning True if stopped meanwhile"""
+        remaining = deadline - time.perf_counter()
+        if remaining > self.SPIN_TIME and self.stopped.wait(remaining - self.SPIN_TIME):
+            return True
+        while time.perf_counter() < deadline:
+            pass
+        return self.stopped.is_set()
+
+    def run(self):
+        try:
+            if self.ready is not None:
+                self.ready.result()
+            with PowerSupply.session(self.device) as power_supply:
+                driver = power_supply.driver
+                driver.check_setpoint('voltage', self.profile.max_voltage)
+                use_list = driver.supports_list(self.profile.steps)
+                if self.mode == 'list' and not use_list:
+                    raise ValueError(f"The {driver.model} has no list memory for this profile")
+                if self.mode == 'host':
+                    use_list = False
+
+                if use_list:
+                    summary = self.run_list(power_supply, driver)
+                else:
+                    summary = self.run_host(power_supply, driver)
+            self.events.put(('done', self.device, self.channel, summary))
+        except Exception as e:
+            self.forget_voltage()
+            self.events.put(('error', self.device, self.channel, str(e)))
+
+    def forget_voltage(self):
+        """The voltage of the channel is no longer known, e.g. after a failed write"""
+        if self.state is not None:
+            self.state.invalidate(self.device, self.channel, 'voltage')
+
+    def run_list(self, power_supply, driver):
+        """Upload the steps, start them and wait for the instrument to play them"""
+        # The instrument moves the voltage on its own from here, and may be aborted mid-profile
+        self.forget_voltage()
+        for command in driver.list_upload_commands(self.profile.steps, self.channel):
+            power_supply.write(command)
+        power_supply.write(driver.list_command('start', self.channel))
+
+        aborted = self.wait_until(time.perf_counter() + self.profile.duration)
+        if aborted:
+            power_supply.write(driver.list_command('abort', self.channel))
+        # Give the setpoint back to VOLT so later steps and the GUI work as before
+        power_supply.write(driver.list_command('fixed', self.channel))
+        self.forget_voltage()
+        return {'mode': 'list', 'steps': len(self.profile.steps), 'aborted': aborted}
+
+    def run_host(self, power_supply, driver):
+        """Write every step at its deadline; deadlines stay on the original grid even when late"""
+        start = time.perf_counter() + self.START_DELAY
+        offset = 0.0
+        latenesses = []
+        aborted = False
+        for index, (voltage, dwell) in enumerate(self.profile.steps):
+            deadline = start + offset
+            if self.wait_until(deadline):
+                aborted = True
+                break
+            lateness = time.perf_counter() - deadline
+            power_supply.write(driver.command('voltage', self.channel, value=f"{voltage:g}"))
+            if self.state is not None:
+                self.state.update(self.device, self.channel, voltage=voltage)
+            latenesses.append(lateness)
+            self.events.put(('step', self.device, self.channel, index, voltage, lateness))
+            offset += dwell
+
+        if not aborted:
+            aborted = self.wait_until(start + offset)
+        return {
+            'mode': 'host',
+            'steps': len(latenesses),
+            'aborted': aborted,
+            'max_lateness': max(latenesses) if latenesses else 0.0,
+            'mean_lateness': sum(latenesses) / len(latenesses) if latenesses else 0.0,
+        }
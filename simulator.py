@@ -0,0 +1,365 @@
+import random
+import re
+import threading
+import time
+
+from pyvisa import constants
+from pyvisa.errors import VisaIOError
+
+# Supported models: *IDN? answer, channel count, ratings, reading format and remote lock behaviour
+MODELS = {
+    'PS 2042-06 B': {
+        'idn': "EA-ELEKTRO-AUTOMATIK,PS 2042-06 B,{serial},V2.07",
+        'channels': 1, 'max_voltage': 42.0, 'max_current': 6.0,
+        'units': True, 'requires_lock': True,
+    },
+    'PS 2342-06 B': {
+        'idn': "EA-ELEKTRO-AUTOMATIK,PS 2342-06 B,{serial},V2.07",
+        'channels': 2, 'max_voltage': 42.0, 'max_current': 6.0,
+        'units': True, 'requires_lock': True,
+    },
+    'IT6018C-1500-40': {
+        'idn': "ITECH Ltd.,IT6018C-1500-40,{serial},1.05-1.02",
+        'channels': 1, 'max_voltage': 1500.0, 'max_current': 40.0,
+        'units': False, 'requires_lock': False,
+    },
+}
+
+# Long SCPI mnemonics and the short forms the simulator works with
+LONG_FORMS = {
+    'SYSTEM': 'SYST', 'VOLTAGE': 'VOLT', 'CURRENT': 'CURR', 'PROTECTION': 'PROT',
+    'OUTPUT': 'OUTP', 'MEASURE': 'MEAS', 'POWER': 'POW', 'SOURCE': 'SOUR',
+    'STATE': 'STAT', 'LEVEL': 'LEV', 'IMMEDIATE': 'IMM', 'AMPLITUDE': 'AMPL',
+    'SCALAR': 'SCAL', 'DWELL': 'DWEL', 'COUNT': 'COUN', 'TRIGGER': 'TRIG', 'TRANSIENT': 'TRAN',
+    'INITIATE': 'INIT', 'ABORT': 'ABOR',
+}
+# Optional nodes that do not change the meaning of a command
+IMPLIED_NODES = ('SOUR', 'LEV', 'IMM', 'AMPL', 'STAT', 'SCAL')
+CHANNEL_LIST_PATTERN = re.compile(r'\(@([\d,:\s]+)\)')
+
+class SimulatedChannel:
+    """Settings and output state of one simulated output"""
+
+    def __init__(self, max_voltage, max_current):
+        self.max_voltage = max_voltage
+        self.max_current = max_current
+        self.reset()
+
+    def reset(self):
+        self.voltage = 0.0
+        self.current_limit = self.max_current
+        self.ovp = self.max_voltage * 1.1
+        self.ocp = self.max_current * 1.1
+        self.output = False
+        self.locked = False
+        self.list_levels = []
+        self.list_dwells = []
+        self.list_mode = False
+        self.list_started = None
+
+    def setpoint(self):
+        """Voltage setpoint, following the list memory while a list is running"""
+        if self.list_started is not None:
+            elapsed = time.monotonic() - self.list_started
+            for level, dwell in zip(self.list_levels, self.list_dwells):
+                if elapsed < dwell:
+                    return level
+                elapsed -= dwell
+            # The last level is kept once the list is over
+            self.voltage = self.list_levels[-1]
+            self.list_started = None
+        return self.voltage
+
+    def readings(self, load_ohms, noise):
+        """Return the (voltage, current, power) seen at the output terminals"""
+        if not self.output:
+            return 0.0, 0.0, 0.0
+
+        # Constant voltage until the load draws more than the current limit
+        voltage = self.setpoint()
+        current = voltage / load_ohms if load_ohms > 0 else self.current_limit
+        if current > self.current_limit:
+            current = self.current_limit
+            voltage = current * load_ohms
+
+        voltage *= 1 + random.gauss(0, noise)
+        current *= 1 + random.gauss(0, noise)
+        return voltage, current, voltage * current
+
+    def check_protections(self, load_ohms):
+        """Switch the output off when a protection limit is exceeded, like the real supplies"""
+        if not self.output:
+            return
+        voltage = self.setpoint()
+        current = voltage / load_ohms if load_ohms > 0 else self.current_limit
+        if voltage > self.ovp or min(current, self.current_limit) > self.ocp:
+            self.output = False
+
+class SimulatedDevice:
+    """One simulated power supply, shared by every session opened on its resource"""
+
+    def __init__(self, resource_name, model, serial, settings):
+        self.resource_name = resource_name
+        self.model = model
+        self.settings = settings
+        self.profile = MODELS.get(model)
+
+        # Transactions on a bus are serialized, as on a real USB or serial link
+        self.lock = threading.Lock()
+        self.channels = []
+        if self.profile is not None:
+            self.idn = self.profile['idn'].format(serial=serial)
+            self.channels = [SimulatedChannel(self.profile['max_voltage'], self.profile['max_current'])
+                             for _ in range(self.profile['channels'])]
+
+    @property
+    def responsive(self):
+        return self.profile is not None
+
+    def select_channels(self, argument):
+        """Return the channels addressed by a (@n,m) list, all of them for single channel devices"""
+        match = CHANNEL_LIST_PATTERN.search(argument)
+        if not match:
+            return self.channels[:1], argument.strip()
+
+        selected = []
+        for item in match.group(1).split(','):
+            if ':' in item:
+                first, last = item.split(':')
+                numbers = range(int(first), int(last) + 1)
+            else:
+                numbers = [int(item)]
+            for number in numbers:
+                if not 1 <= number <= len(self.channels):
+                    raise ValueError(f"Channel {number} out of range")
+                selected.append(self.channels[number - 1])
+        remainder = (argument[:match.start()] + argument[match.end():]).strip()
+        return selected, remainder
+
+    def format_reading(self, value, unit):
+        if self.profile['units']:
+            return f"{value:.2f} {unit}"
+        return f"{value:.4f}"
+
+    def execute(self, command):
+        """Run one or several ';' separated commands, returning the reply or None for writes"""
+        replies = []
+        for part in command.split(';'):
+            part = part.strip()
+            if not part:
+                continue
+            reply = self.execute_one(part)
+            if reply is not None:
+                replies.append(reply)
+        return ';'.join(replies) if replies else None
+
+    def execute_one(self, command):
+        header, _, argument = command.partition(' ')
+        nodes = [LONG_FORMS.get(node, node) for node in header.lstrip(':').upper().split(':')]
+        nodes = [node for node in nodes if node not in IMPLIED_NODES]
+        header = ':'.join(nodes)
+        is_query = header.endswith('?')
+        header = header.rstrip('?')
+        channels, value = self.select_channels(argument)
+        load_ohms = self.settings['load_ohms']
+
+        if header == '*IDN':
+            return self.idn
+        if header == '*OPC':
+            return '1'
+        if header == '*RST':
+            for channel in self.channels:
+                channel.reset()
+            return None
+
+        if header == 'SYST:LOCK':
+            if is_query:
+                return ','.join('1' if channel.locked else '0' for channel in channels)
+            for channel in channels:
+                channel.locked = value.upper() in ('ON', '1')
+            return None
+
+        if header == 'OUTP':
+            if is_query:
+                return ','.join('1' if channel.output else '0' for channel in channels)
+            for channel in channels:
+                if self.accepts_settings(channel):
+                    channel.output = value.upper() in ('ON', '1')
+                    channel.check_protections(load_ohms)
+            return None
+
+        if header.startswith('MEAS:'):
+            index, unit = {'MEAS:VOLT': (0, 'V'), 'MEAS:CURR': (1, 'A'), 'MEAS:POW': (2, 'W')}[header]
+            return ','.join(self.format_reading(channel.readings(load_ohms, self.settings['noise'])[index], unit)
+                            for channel in channels)
+
+        if header.startswith('LIST:') or header in ('VOLT:MODE', 'TRIG:TRAN', 'INIT:TRAN', 'ABOR:TRAN'):
+            return self.execute_list(header, is_query, value, channels)
+
+        if header == 'VOLT' and is_query:
+            return ','.join(self.format_reading(channel.setpoint(), 'V') for channel in channels)
+
+        attribute = {'VOLT': 'voltage', 'VOLT:PROT': 'ovp', 'CURR': 'current_limit',
+                     'CURR:PROT': 'ocp'}[header]
+        if is_query:
+            return ','.join(self.format_reading(getattr(channel, attribute), 'A' if 'CURR' in header else 'V')
+                            for channel in channels)
+        number = float(value)
+        for channel in channels:
+            if self.accepts_settings(channel):
+                setattr(channel, attribute, number)
+                channel.check_protections(load_ohms)
+        return None
+
+    def execute_list(self, header, is_query, value, channels):
+        """List mode: levels and dwell times played from the instrument memory after INIT:TRAN"""
+        if is_query:
+            raise KeyError(header)
+        for channel in channels:
+            if not self.accepts_settings(channel):
+                continue
+            if header == 'LIST:VOLT':
+                channel.list_levels = [float(level) for level in value.split(',')]
+            elif header == 'LIST:DWEL':
+                channel.list_dwells = [float(dwell) for dwell in value.split(',')]
+            elif header == 'VOLT:MODE':
+                channel.list_mode = value.upper().startswith('LIST')
+            elif header == 'INIT:TRAN':
+                if channel.list_mode and channel.list_levels and len(channel.list_levels) == len(channel.list_dwells):
+                    channel.list_started = time.monotonic()
+            elif header == 'ABOR:TRAN' and channel.list_started is not None:
+                channel.voltage = channel.setpoint()
+                channel.list_started = None
+        return None
+
+    def accepts_settings(self, channel):
+        """EA supplies ignore settings while they are controlled from the front panel"""
+        return channel.locked or not self.profile['requires_lock']
+
+class SimulatedInstrument:
+    """Session on a simulated device, offering the subset of the pyvisa Resource API the tool uses"""
+
+    def __init__(self, device, settings, timeout):
+        self.device = device
+        self.settings = settings
+        self.timeout = timeout  # Milliseconds, like pyvisa
+        self.pending = None
+        self.closed = False
+
+    def delay(self, command):
+        """Time taken by a transaction: base or per-command latency plus jitter"""
+        mnemonic = command.lstrip(':').split(':')[0].split(' ')[0].rstrip('?').upper()
+        latency = self.settings['command_latency'].get(mnemonic, self.settings['latency'])
+        jitter = self.settings['jitter']
+        return max(latency + random.uniform(-jitter, jitter), 0.0)
+
+    def transaction(self, command):
+        if self.closed:
+            raise VisaIOError(constants.StatusCode.error_invalid_object)
+
+        timeout = self.timeout / 1000 if self.timeout is not None else None
+        with self.device.lock:
+            delay = self.delay(command)
+            failed = not self.device.responsive or random.random() < self.settings['failure_rate']
+            if failed or (timeout is not None and delay > timeout):
+                time.sleep(timeout if timeout is not None else delay)
+                raise VisaIOError(constants.StatusCode.error_timeout)
+            time.sleep(delay)
+
+            try:
+                return self.device.execute(command)
+            except (KeyError, ValueError, IndexError):
+                # Unknown commands are ignored; an unknown query never gets an answer
+                if command.strip().split(' ')[0].endswith('?'):
+                    time.sleep(timeout or 0)
+                    raise VisaIOError(constants.StatusCode.error_timeout)
+                return None
+
+    def write(self, command):
+        reply = self.transaction(command)
+        self.pending = reply if reply is not None else self.pending
+        return len(command)
+
+    def read(self):
+        if self.pending is None:
+            time.sleep(self.timeout / 1000 if self.timeout is not None else 0)
+            raise VisaIOError(constants.StatusCode.error_timeout)
+        reply, self.pending = self.pending, None
+        return reply + '\n'
+
+    def query(self, command):
+        reply = self.transaction(command)
+        if reply is None:
+            time.sleep(self.timeout / 1000 if self.timeout is not None else 0)
+            raise VisaIOError(constants.StatusCode.error_timeout)
+        return reply + '\n'
+
+    def clear(self):
+        self.pending = None
+
+    def close(self):
+        self.closed = True
+
+class SimulatedResourceManager:
+    """Drop-in replacement for pyvisa.ResourceManager serving simulated power supplies
+
+    models lists one model name per simulated device (see MODELS). Any other name
+    gives a resource that never answers, like an unpowered instrument. Latencies
+    and jitter are in seconds, failure_rate is the probability that a transaction
+    times out.
+    """
+
+    visalib = "Simulated power supplies"
+
+    def __init__(self, models, latency=0.005, jitter=0.001, failure_rate=0.0, command_latency=None,
+                 load_ohms=10.0, noise=0.001):
+        self.settings = {
+            'latency': latency,
+            'jitter': jitter,
+            'failure_rate': failure_rate,
+            'command_latency': {mnemonic.upper(): seconds for mnemonic, seconds in (command_latency or {}).items()},
+            'load_ohms': load_ohms,
+            'noise': noise,
+        }
+        self.devices = {}
+        for index, model in enumerate(models, start=1):
+            slug = re.sub(r'[^0-9A-Za-z]+', '-', model).strip('-')
+            resource_name = f"SIM{index}::{slug}::INSTR"
+            self.devices[resource_name] = SimulatedDevice(resource_name, model, f"{index:08d}", self.settings)
+
+    @staticmethod
+    def from_config(config):
+        """Build the simulator from the [simulator] section of alimentation.ini"""
+        section = 'simulator'
+        models = [model.strip() for model in
+                  config.get(section, 'devices', fallback=', '.join(MODELS)).split(',') if model.strip()]
+
+        # command_latency_ms = MEAS:15, *IDN:40
+        command_latency = {}
+        for item in config.get(section, 'command_latency_ms', fallback='').split(','):
+            mnemonic, _, milliseconds = item.rpartition(':')
+            if mnemonic.strip():
+                command_latency[mnemonic.strip()] = float(milliseconds) / 1000
+
+        return SimulatedResourceManager(
+            models,
+            latency=config.getfloat(section, 'latency_ms', fallback=5.0) / 1000,
+            jitter=config.getfloat(section, 'jitter_ms', fallback=1.0) / 1000,
+            failure_rate=config.getfloat(section, 'failure_rate', fallback=0.0),
+            command_latency=command_latency,
+            load_ohms=config.getfloat(section, 'load_ohms', fallback=10.0),
+            noise=config.getfloat(section, 'noise', fallback=0.001)
+        )
+
+    def list_resources(self, query='?*::INSTR'):
+        return tuple(self.devices)
+
+    def open_resource(self, resource_name, access_mode=None, open_timeout=0, **kwargs):
+        device = self.devices.get(resource_name)
+        if device is None:
+            raise VisaIOError(constants.StatusCode.error_resource_not_found)
+        # Like pyvisa, keyword arguments set attributes of the new session
+        return SimulatedInstrument(device, self.settings, timeout=kwargs.get('timeout', 2000))
+
+    def close(self):
+        pass
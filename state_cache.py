@@ -0,0 +1,78 @@
+import threading
+import time
+
+class StateCache:
+    """Shadow copy of the last known settings of every channel
+
+    Values come from the commands sent by this tool and from resync queries,
+    each with the time it became known. A channel locked by this tool can only
+    be changed through it, so its setpoints are trusted until invalidated; the
+    setpoints known before it was locked are dropped when it is locked. Its
+    output can still be switched off by a protection trip, so the output state
+    expires after output_max_age seconds. Unlocked channels can be changed from
+    the front panel and all their values expire after unlocked_max_age seconds.
+    """
+
+    FIELDS = ('voltage', 'overvoltage', 'overcurrent', 'output', 'locked')
+
+    def __init__(self, output_max_age=5.0, unlocked_max_age=2.0):
+        self.output_max_age = output_max_age
+        self.unlocked_max_age = unlocked_max_age
+        self.entries = {}  # (device, channel) -> {field: (value, monotonic time)}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def update(self, device, channel, **values):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.setdefault((device, channel), {})
+            for field, value in values.items():
+                entry[field] = (value, now)
+
+    def max_age(self, entry, field):
+        if field == 'locked':
+            return None
+        if field == 'output':
+            return self.output_max_age
+        locked = entry.get('locked')
+        return None if locked and locked[0] else self.unlocked_max_age
+
+    def get(self, device, channel, field):
+        """Return the cached value of a field, or None when unknown or expired"""
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get((device, channel), {})
+            known = entry.get(field)
+            max_age = self.max_age(entry, field)
+            if known is None or (max_age is not None and now - known[1] > max_age):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return known[0]
+
+    def invalidate(self, device, channel, *fields):
+        """Forget some fields of a channel, or all of them when none are given"""
+        with self.lock:
+            entry = self.entries.get((device, channel))
+            if entry is None:
+                return
+            for field in fields or self.FIELDS:
+                entry.pop(field, None)
+
+    def invalidate_device(self, device):
+        with self.lock:
+            for key in [key for key in self.entries if key[0] == device]:
+                del self.entries[key]
+
+    def snapshot(self, device, channel):
+        """Return {field: {'value', 'age', 'fresh'}} for the known fields of a channel"""
+        now = time.monotonic()
+        with self.lock:
+            entry = dict(self.entries.get((device, channel), {}))
+        snapshot = {}
+        for field, (value, timestamp) in entry.items():
+            max_age = self.max_age(entry, field)
+            snapshot[field] = {'value': value, 'age': round(now - timestamp, 3),
+                               'fresh': max_age is None or now - timestamp <= max_age}
+        return snapshot